@@ -0,0 +1,118 @@
+"""Bulk upsert of imported medicine records with delta detection.
+
+Every record is compared with the stored document of the same
+(Batch_ID, Name of Medicine):
+
+* unknown keys become upserts carrying every field;
+* known keys get a ``$set`` of only the fields whose value changed (usually
+  price and quantity), plus ``updated_at``;
+* records identical to the stored document are not sent at all.
+
+Empty cells (None/NaN) are never written: a new document simply lacks the
+field, and a stored value is not overwritten with null by a partial upload.
+
+Operations go out as unordered ``bulk_write`` batches of
+``IMPORT_BULK_CHUNK`` (default 500) ``UpdateOne(upsert=True)``, backed by a
+unique compound index on the key, so one round trip covers hundreds of rows
+and a failing row does not stop the others.
+"""
+import math
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+KEY_COLS = ["Batch_ID", "Name of Medicine"]
+KEY_INDEX = "batch_id_name_unique"
+# Columns of the import result that are not catalog fields
+SKIP_COLS = {"_id", "_merge", "status_import", "updated_at"}
+CHUNK_SIZE = int(os.getenv("IMPORT_BULK_CHUNK", "500"))
+
+_indexed = set()
+
+
+def ensure_key_index(collection):
+    """Create the unique (Batch_ID, Name of Medicine) index once per collection and process."""
+    ident = (collection.database.name, collection.name)
+    if ident in _indexed:
+        return
+    try:
+        collection.create_index([(col, ASCENDING) for col in KEY_COLS], unique=True, name=KEY_INDEX)
+    except OperationFailure as e:
+        # Usually existing duplicates; upserts still work, just without the uniqueness guarantee
+        print(f"Could not create unique index {KEY_INDEX}: {e}")
+    _indexed.add(ident)
+
+
+def plain(value):
+    """BSON-friendly Python value: numpy scalars unwrapped, NaN/NaT as None."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+def frame_records(df):
+    columns = [col for col in df.columns if col not in SKIP_COLS]
+    return [{col: plain(value) for col, value in zip(columns, row)}
+            for row in df[columns].astype(object).itertuples(index=False, name=None)]
+
+
+def plan_writes(records_df, stored_df):
+    """Return ``(operations, unchanged)`` upserting ``records_df`` over ``stored_df``."""
+    stored = {}
+    if stored_df is not None and not stored_df.empty and all(col in stored_df.columns for col in KEY_COLS):
+        for doc in frame_records(stored_df):
+            stored[tuple(doc[col] for col in KEY_COLS)] = doc
+    records = {}
+    for record in frame_records(records_df):
+        # Last occurrence wins, like the merge in update_medicine_records
+        records[tuple(record[col] for col in KEY_COLS)] = record
+
+    now = datetime.now(timezone.utc)
+    operations, unchanged = [], 0
+    for key, record in records.items():
+        key_filter = dict(zip(KEY_COLS, key))
+        fields = {col: value for col, value in record.items() if col not in KEY_COLS and value is not None}
+        current = stored.get(key)
+        if current is None:
+            changed = fields
+        else:
+            changed = {col: value for col, value in fields.items() if current.get(col) != value}
+            if not changed:
+                unchanged += 1
+                continue
+        operations.append(UpdateOne(key_filter, {"$set": {**changed, "updated_at": now}}, upsert=True))
+    return operations, unchanged
+
+
+def write_records(collection, records_df, stored_df, chunk_size=CHUNK_SIZE):
+    """Upsert ``records_df`` into ``collection``; ``stored_df`` holds the current documents of those keys.
+
+    Returns ``{"inserted", "modified", "unchanged", "errors"}``.
+    """
+    ensure_key_index(collection)
+    operations, unchanged = plan_writes(records_df, stored_df)
+    summary = {"inserted": 0, "modified": 0, "unchanged": unchanged, "errors": 0}
+    for start in range(0, len(operations), chunk_size):
+        chunk = operations[start:start + chunk_size]
+        try:
+            result = collection.bulk_write(chunk, ordered=False)
+            inserted, matched, modified = result.upserted_count, result.matched_count, result.modified_count
+        except BulkWriteError as e:
+            details = e.details
+            inserted, matched, modified = details["nUpserted"], details["nMatched"], details["nModified"]
+            summary["errors"] += len(details["writeErrors"])
+            print(f"Bulk write: {len(details['writeErrors'])} of {len(chunk)} operations failed, "
+                  f"first: {details['writeErrors'][0].get('errmsg')}")
+        summary["inserted"] += inserted
+        summary["modified"] += modified
+        # Matched but not modified: the stored document changed to these values in the meantime
+        summary["unchanged"] += matched - modified
+    return summary
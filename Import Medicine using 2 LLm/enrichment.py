@@ -0,0 +1,366 @@
+"""Concurrent, rate-limited enrichment of the medicines missing from the catalog.
+
+``client_data_preparation`` hands every unmatched (Batch_ID, name) pair to an
+``EnrichmentEngine``, which runs the search + extraction calls on a bounded
+thread pool: first one grounded search per medicine, then the extraction
+prompts, ``ENRICH_BATCH_SIZE`` medicines per prompt. Each Gemini client is
+created once per process and wrapped in a ``RateLimitedClient``: every
+call first takes a token from the token bucket of its API key, and transient
+errors (429, 5xx, timeouts) are retried with exponential backoff and full
+jitter. An extraction prompt that still fails with a transient error is
+re-queued whole (``ENRICH_REQUEUE`` rounds) rather than split into one
+prompt per medicine. A medicine that still fails gets the "not_found"
+record and is reported, so one failure never stalls the batch.
+
+    ENRICH_WORKERS          concurrent medicines, default 8
+    ENRICH_BATCH_SIZE       medicines per extraction prompt, default 10 (1 = one prompt each)
+    ENRICH_RATE_PER_MIN     requests per minute per API key, default 60 (0 = unlimited)
+    ENRICH_BURST            requests an idle key may send at once, default 5
+    ENRICH_MAX_RETRIES      retries of a transient error, default 4
+    ENRICH_REQUEUE          rounds a failed extraction prompt is re-queued, default 1
+    ENRICH_BACKOFF_BASE     first backoff ceiling in seconds, default 1 (doubles per retry)
+    ENRICH_BACKOFF_MAX      backoff ceiling in seconds, default 30
+
+With ``ENRICH_FAKE_LLM=1`` the app uses ``FakeLLMClient`` instead of Gemini
+(ENRICH_FAKE_LATENCY seconds per call, ENRICH_FAKE_ERROR_RATE and
+ENRICH_FAKE_MALFORMED_RATE as fractions of calls). The engine can also be
+exercised on its own:
+
+    python enrichment.py --items 500 --workers 16 --latency 0.5 --error-rate 0.1 --rate-per-min 1200
+"""
+import argparse
+import contextvars
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
+
+# HTTP status codes worth retrying: timeouts, rate limits, server errors
+TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+
+WORKERS = int(os.getenv("ENRICH_WORKERS", "8"))
+BATCH_SIZE = max(1, int(os.getenv("ENRICH_BATCH_SIZE", "10")))
+RATE_PER_MIN = float(os.getenv("ENRICH_RATE_PER_MIN", "60"))
+BURST = float(os.getenv("ENRICH_BURST", "5"))
+MAX_RETRIES = int(os.getenv("ENRICH_MAX_RETRIES", "4"))
+REQUEUE = int(os.getenv("ENRICH_REQUEUE", "1"))
+BACKOFF_BASE = float(os.getenv("ENRICH_BACKOFF_BASE", "1"))
+BACKOFF_MAX = float(os.getenv("ENRICH_BACKOFF_MAX", "30"))
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX, rng=random):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2 ** attempt)]."""
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def is_transient(error):
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return code in TRANSIENT_CODES or isinstance(error, (TimeoutError, ConnectionError))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, at most ``burst`` saved up."""
+
+    def __init__(self, rate, burst=1.0):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available; return the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_for(api_key, rate_per_min=RATE_PER_MIN, burst=BURST):
+    """The process-wide bucket of ``api_key`` (None when unlimited); clients sharing a key share it."""
+    if rate_per_min <= 0:
+        return None
+    with _buckets_lock:
+        bucket = _buckets.get(api_key)
+        if bucket is None:
+            bucket = _buckets[api_key] = TokenBucket(rate_per_min / 60.0, burst)
+        return bucket
+
+
+class _Models:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def generate_content(self, **kwargs):
+        return self._owner.generate_content(**kwargs)
+
+
+class RateLimitedClient:
+    """``genai.Client`` look-alike that rate-limits and retries ``models.generate_content``."""
+
+    def __init__(self, client, bucket=None, max_retries=MAX_RETRIES):
+        self.client = client
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.models = _Models(self)
+        self.calls = 0
+        self.retries = 0
+        self.throttled_s = 0.0
+        self._lock = threading.Lock()
+
+    def generate_content(self, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            waited = self.bucket.acquire() if self.bucket is not None else 0.0
+            with self._lock:
+                self.calls += 1
+                self.throttled_s += waited
+            try:
+                return self.client.models.generate_content(**kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                delay = backoff_delay(attempt)
+                with self._lock:
+                    self.retries += 1
+                print(f"Transient LLM error ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "retries": self.retries, "throttled_s": round(self.throttled_s, 2)}
+
+
+class FakeLLMError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} fake LLM error")
+        self.code = code
+
+
+class FakeLLMClient:
+    """Local stand-in for ``genai.Client`` with configurable latency and failures.
+
+    Extraction prompts (``Batch_no: "..."`` / ``Medicine name: "..."``) get
+    a JSON record back, or a JSON array of records when the prompt lists
+    several medicines; other prompts get free text. ``error_rate`` of the
+    calls raise a transient ``FakeLLMError`` (429 or 503) and
+    ``malformed_rate`` return text that is not JSON; in a batched answer each
+    item is also dropped or broken with probability ``malformed_rate``.
+    """
+
+    def __init__(self, latency=0.2, error_rate=0.0, malformed_rate=0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.models = self
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            latency=float(os.getenv("ENRICH_FAKE_LATENCY", "0.2")),
+            error_rate=float(os.getenv("ENRICH_FAKE_ERROR_RATE", "0")),
+            malformed_rate=float(os.getenv("ENRICH_FAKE_MALFORMED_RATE", "0")),
+        )
+
+    @staticmethod
+    def _response(text):
+        part = SimpleNamespace(text=text)
+        return SimpleNamespace(text=text, candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+    def generate_content(self, model=None, contents="", config=None):
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+            latency = self.latency * self._rng.uniform(0.5, 1.5)
+            code = self._rng.choice((429, 503))
+        time.sleep(latency)
+        if roll < self.error_rate:
+            raise FakeLLMError(code)
+        if roll < self.error_rate + self.malformed_rate:
+            return self._response("Sorry, here is the data: {")
+        pairs = re.findall(r'Batch_no: "(.*?)"\s*Medicine name: "(.*?)"', contents)
+        if not pairs:
+            name = re.search(r"Medicine Name: (.+)", contents)
+            name = name.group(1).strip() if name else "unknown"
+            return self._response(f"{name} is a commonly used medicine. Category: Analgesics. Form: Tablet.")
+        if len(pairs) == 1:
+            return self._response(json.dumps(self._record(*pairs[0])))
+        with self._lock:
+            rolls = [self._rng.random() for _ in pairs]
+        records = []
+        for (batch_no, name), item_roll in zip(pairs, rolls):
+            if item_roll < self.malformed_rate / 2:
+                continue
+            record = self._record(batch_no, name)
+            if item_roll < self.malformed_rate:
+                del record["Symptoms"]
+            records.append(record)
+        return self._response("```json\n" + json.dumps(records) + "\n```")
+
+    @staticmethod
+    def _record(batch_no, name):
+        return {
+            "Batch_ID": batch_no,
+            "Name of Medicine": name,
+            "Category": "Analgesics",
+            "Medicine Forms": "Tablet",
+            "Quantity_per_pack": "10 Tablets",
+            "Cover Disease": "fever, pain",
+            "Symptoms": "fever, headache",
+            "Side Effects": "nausea",
+            "Instructions": "Take 1 tablet after food",
+            "Description in Hinglish": f"{name} bukhar aur dard ke liye",
+        }
+
+
+_clients = None
+_clients_lock = threading.Lock()
+
+
+def enrichment_clients():
+    """The process-wide ``(search_client, data_client)``, rate-limited per API key.
+
+    Gemini clients use GENAI_API_KEY_google_search and GENAI_API_KEY_llm_data
+    and are created once, so their HTTP connections are reused across calls
+    and imports; with ENRICH_FAKE_LLM=1 both are ``FakeLLMClient``s.
+    """
+    global _clients
+    with _clients_lock:
+        if _clients is None:
+            clients = []
+            for env_var in ("GENAI_API_KEY_google_search", "GENAI_API_KEY_llm_data"):
+                if os.getenv("ENRICH_FAKE_LLM") == "1":
+                    client, api_key = FakeLLMClient.from_env(), f"fake:{env_var}"
+                else:
+                    from google import genai
+
+                    api_key = os.getenv(env_var)
+                    client = genai.Client(api_key=api_key)
+                clients.append(RateLimitedClient(client, bucket_for(api_key)))
+            _clients = tuple(clients)
+        return _clients
+
+
+class EnrichmentEngine:
+    """Runs ``enrich_one(key, value)`` for many items on a bounded thread pool.
+
+    Items are usually ``{batch_no: medicine name}``; batched extraction passes
+    ``{chunk number: [(batch_no, name, raw_data), ...]}``.
+    """
+
+    def __init__(self, enrich_one, workers=WORKERS, label="medicines"):
+        self.enrich_one = enrich_one
+        self.workers = max(1, workers)
+        self.label = label
+
+    def run(self, items, fallback, requeue=0):
+        """Enrich ``items`` ({key: value}); return ``(results, failures)`` in input order.
+
+        An item whose call raises gets ``fallback(key, value)`` and an entry
+        in ``failures`` ({key: error}); the others are unaffected. With
+        ``requeue``, items that failed with a transient error (after the
+        client's own retries) are first run again, up to ``requeue`` rounds.
+        """
+        items = dict(items)
+        results, failures = {}, {}
+        if not items:
+            return [], failures
+        start = time.time()
+        pending = items
+        for round_no in range(requeue + 1):
+            errors = self._run_round(pending, results, start)
+            retry = {key: items[key] for key, e in errors.items() if round_no < requeue and is_transient(e)}
+            for key, e in errors.items():
+                if key not in retry:
+                    print(f"Enrichment failed for {items[key]} ({key}): {e}")
+                    failures[key] = str(e)
+                    results[key] = fallback(key, items[key])
+            if not retry:
+                break
+            delay = backoff_delay(MAX_RETRIES + round_no)
+            print(f"Re-queueing {len(retry)} {self.label} after transient errors in {delay:.1f}s")
+            time.sleep(delay)
+            pending = retry
+        return [results[batch_no] for batch_no in items], failures
+
+    def _run_round(self, items, results, start):
+        """Run ``items`` once, storing successes in ``results``; return ``{key: exception}`` of the rest."""
+        errors = {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as pool:
+            # Copied contexts let stage timers in the workers reach the current request
+            futures = {pool.submit(contextvars.copy_context().run, self.enrich_one, batch_no, name): batch_no
+                       for batch_no, name in items.items()}
+            for done, future in enumerate(as_completed(futures), 1):
+                batch_no = futures[future]
+                try:
+                    results[batch_no] = future.result()
+                except Exception as e:
+                    errors[batch_no] = e
+                if done % 25 == 0 or done == len(items):
+                    print(f"Enriched {done}/{len(items)} {self.label} ({len(errors)} failed) "
+                          f"in {time.time() - start:.1f}s")
+        return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the enrichment engine against the fake LLM client.")
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="medicines per extraction prompt")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake LLM call")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="fraction of calls failing with 429/503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fraction of calls returning broken JSON")
+    parser.add_argument("--rate-per-min", type=float, default=RATE_PER_MIN, help="per API key, 0 = unlimited")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeLLMClient(args.latency, args.error_rate, args.malformed_rate, seed=args.seed)
+    search = RateLimitedClient(fake, bucket_for("fake:search", args.rate_per_min))
+    data = RateLimitedClient(fake, bucket_for("fake:data", args.rate_per_min))
+
+    def search_one(batch_no, name):
+        # Same call shape as google_search_raw
+        return search.models.generate_content(model="fake", contents=f"Medicine Name: {name}").text
+
+    def extract_chunk(_, chunk):
+        # Same prompt skeleton as llm_data / llm_data_batch, without the instructions
+        contents = "\n".join(f'Batch_no: "{batch_no}"\nMedicine name: "{name}"\nRaw text: "{raw}"'
+                             for batch_no, name, raw in chunk)
+        text = data.models.generate_content(model="fake", contents=contents).text
+        parsed = json.loads(re.sub(r"^```json|```$", "", text, flags=re.MULTILINE).strip())
+        return parsed if isinstance(parsed, list) else [parsed]
+
+    items = {f"BATCH_{i:05d}": f"Medicine {i}" for i in range(args.items)}
+    start = time.time()
+    raw_data, failures = EnrichmentEngine(search_one, args.workers).run(items, lambda batch_no, name: None)
+    to_extract = [(b, n, raw) for (b, n), raw in zip(items.items(), raw_data) if raw is not None]
+    chunks = dict(enumerate(to_extract[i:i + args.batch_size] for i in range(0, len(to_extract), args.batch_size)))
+    extracted, chunk_failures = EnrichmentEngine(extract_chunk, args.workers, label="prompts").run(
+        chunks, lambda i, chunk: [])
+    records = sum(len(part) for part in extracted)
+    elapsed = time.time() - start
+    print(f"{args.items} medicines in {elapsed:.1f}s ({args.items / elapsed:.1f}/s): {len(failures)} searches and "
+          f"{len(chunk_failures)} prompts failed, {records} records extracted from {len(chunks)} prompts")
+    print(f"search: {search.stats()}  data: {data.stats()}  fake calls: {fake.calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Persistent cache of enriched medicine records, keyed by normalized name.
+
+The same branded medicines arrive in upload after upload with different
+Batch_IDs, so ``client_data_preparation`` looks every unmatched medicine up
+here first and only sends the misses to Gemini. Entries hold the validated
+extraction fields (everything except Batch_ID and name), tagged with the
+model/prompt version that produced them; entries of another version or
+older than the TTL count as misses and are replaced on the next write.
+
+    ENRICH_CACHE_PATH       SQLite file, e.g. ~/.cache/aushidi/enrichment_cache.db (unset = off)
+    ENRICH_CACHE_TTL_DAYS   days an entry stays valid, default 30
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# SQLite's default limit on host parameters per statement is 999
+QUERY_CHUNK = 500
+
+
+def normalize_name(name):
+    """Case-folded name with punctuation dropped and whitespace collapsed ("Dolo-650 " == "dolo 650")."""
+    return " ".join(re.sub(r"[^\w+%]+", " ", str(name)).split()).casefold()
+
+
+class EnrichmentCache:
+    def __init__(self, path, version, ttl_days=30.0):
+        self.path = path
+        self.version = version
+        self.ttl = ttl_days * 86400
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS enrichment ("
+            " name TEXT PRIMARY KEY, version TEXT NOT NULL, created REAL NOT NULL, record TEXT NOT NULL)"
+        )
+
+    @classmethod
+    def from_env(cls, version):
+        """The configured cache, or None when ENRICH_CACHE_PATH is not set."""
+        path = os.getenv("ENRICH_CACHE_PATH")
+        if not path:
+            return None
+        path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return cls(path, version, ttl_days=float(os.getenv("ENRICH_CACHE_TTL_DAYS", "30")))
+
+    def get_many(self, names):
+        """Return ``{normalized name: fields}`` for the fresh entries among ``names``."""
+        keys = list(dict.fromkeys(normalize_name(name) for name in names))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), QUERY_CHUNK):
+                chunk = keys[start:start + QUERY_CHUNK]
+                rows = self._db.execute(
+                    f"SELECT name, record FROM enrichment WHERE name IN ({','.join('?' * len(chunk))})"
+                    " AND version = ? AND created >= ?",
+                    (*chunk, self.version, time.time() - self.ttl),
+                ).fetchall()
+                found.update((name, json.loads(record)) for name, record in rows)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, records):
+        """Store ``{medicine name: fields}``; fields must already be validated."""
+        created = time.time()
+        rows = [(normalize_name(name), self.version, created, json.dumps(fields, ensure_ascii=False))
+                for name, fields in records.items()]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO enrichment (name, version, created, record) VALUES (?, ?, ?, ?)", rows)
+            self.writes += len(rows)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "version": self.version,
+            }
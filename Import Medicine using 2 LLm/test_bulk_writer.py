@@ -0,0 +1,28 @@
+"""Tests for bulk_writer.py: run with ``python -m pytest`` from the repository root."""
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pymongo")
+
+from bulk_writer import plan_writes  # noqa: E402
+
+
+def test_plan_writes_skips_empty_cells():
+    stored = pd.DataFrame({"Batch_ID": ["BATCH_1"], "Name of Medicine": ["Dolo 650"],
+                           "Price_INR": [30], "Category": ["Analgesics"]})
+    records = pd.DataFrame({"Batch_ID": ["BATCH_1", "BATCH_2"], "Name of Medicine": ["Dolo 650", "Crocin"],
+                            "Price_INR": [35, 20], "Category": [None, np.nan]})
+    operations, unchanged = plan_writes(records, stored)
+    updates = {op._filter["Batch_ID"]: op._doc["$set"] for op in operations}
+    assert unchanged == 0
+    # The partial update keeps the stored Category, the new row gets no Category field
+    assert set(updates["BATCH_1"]) == {"Price_INR", "updated_at"} and updates["BATCH_1"]["Price_INR"] == 35
+    assert set(updates["BATCH_2"]) == {"Price_INR", "updated_at"}
+
+
+def test_plan_writes_skips_records_with_only_empty_changes():
+    stored = pd.DataFrame({"Batch_ID": ["BATCH_1"], "Name of Medicine": ["Dolo 650"], "Price_INR": [30]})
+    records = stored.assign(Price_INR=[np.nan])
+    operations, unchanged = plan_writes(records, stored)
+    assert not operations and unchanged == 1
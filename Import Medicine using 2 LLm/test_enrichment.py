@@ -0,0 +1,163 @@
+"""Tests for the enrichment path against FakeLLMClient: ``python -m pytest`` from the repository root."""
+import importlib.util
+import json
+import os
+import re
+
+import pytest
+
+import enrichment
+from enrichment import EnrichmentEngine, FakeLLMClient, FakeLLMError, RateLimitedClient
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(enrichment, "backoff_delay", lambda attempt: 0.0)
+
+
+@pytest.fixture(scope="module")
+def import_app(tmp_path_factory):
+    """app.py loaded against mongomock, without the enrichment cache."""
+    for module in ("flask", "pandas", "dotenv", "google.genai", "mongomock"):
+        pytest.importorskip(module)
+    import mongomock
+    import pymongo
+
+    patch = pytest.MonkeyPatch()
+    # The app connects at import with a mongodb+srv URI; mongomock would resolve it too
+    patch.setattr(pymongo, "MongoClient", lambda *args, **kwargs: mongomock.MongoClient())
+    patch.setenv("ENRICH_CACHE_PATH", "")
+    patch.chdir(tmp_path_factory.mktemp("import_app"))  # uploads/ is created in the working directory
+    try:
+        spec = importlib.util.spec_from_file_location("import_medicine_app", APP_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        patch.undo()
+    return module
+
+
+def test_client_retries_transient_errors():
+    fake = FakeLLMClient(latency=0, error_rate=1.0, seed=0)
+    client = RateLimitedClient(fake, max_retries=3)
+    with pytest.raises(FakeLLMError):
+        client.models.generate_content(model="fake", contents="Medicine Name: Dolo 650")
+    assert fake.calls == 4
+    assert client.stats()["calls"] == 4 and client.stats()["retries"] == 3
+
+
+def test_client_does_not_retry_other_errors():
+    class Broken:
+        calls = 0
+
+        def __init__(self):
+            self.models = self
+
+        def generate_content(self, **kwargs):
+            Broken.calls += 1
+            raise ValueError("400 invalid argument")
+
+    client = RateLimitedClient(Broken(), max_retries=3)
+    with pytest.raises(ValueError):
+        client.models.generate_content(model="fake", contents="")
+    assert Broken.calls == 1 and client.stats()["retries"] == 0
+
+
+def test_engine_call_and_retry_counts():
+    fake = FakeLLMClient(latency=0, error_rate=0.3, seed=7)
+    client = RateLimitedClient(fake, max_retries=20)
+    items = {f"BATCH_{i}": f"Medicine {i}" for i in range(30)}
+
+    def search_one(batch_no, name):
+        return client.models.generate_content(model="fake", contents=f"Medicine Name: {name}").text
+
+    results, failures = EnrichmentEngine(search_one, workers=4).run(items, lambda batch_no, name: None)
+    stats = client.stats()
+    assert not failures and all(results)
+    assert stats["retries"] > 0
+    assert fake.calls == stats["calls"] == len(items) + stats["retries"]
+
+
+def test_engine_falls_back_after_retries():
+    fake = FakeLLMClient(latency=0, error_rate=1.0, seed=0)
+    client = RateLimitedClient(fake, max_retries=1)
+    items = {f"BATCH_{i}": f"Medicine {i}" for i in range(5)}
+
+    def search_one(batch_no, name):
+        return client.models.generate_content(model="fake", contents=f"Medicine Name: {name}").text
+
+    results, failures = EnrichmentEngine(search_one, workers=2).run(items, lambda batch_no, name: "fallback")
+    assert results == ["fallback"] * 5 and set(failures) == set(items)
+    assert fake.calls == 10
+
+
+def test_engine_requeues_transient_failures():
+    calls = {}
+
+    def flaky(key, name):
+        calls[key] = calls.get(key, 0) + 1
+        if calls[key] == 1:
+            raise FakeLLMError(429)
+        if key == "BATCH_2":
+            raise ValueError("400 invalid argument")
+        return name
+
+    items = {f"BATCH_{i}": f"Medicine {i}" for i in range(4)}
+    results, failures = EnrichmentEngine(flaky, workers=2).run(items, lambda key, name: "fallback", requeue=1)
+    assert results == ["Medicine 0", "Medicine 1", "fallback", "Medicine 3"]
+    assert set(failures) == {"BATCH_2"}
+    assert all(n == 2 for n in calls.values())
+
+
+class PartialBatchClient(FakeLLMClient):
+    """Batch answers drop the first medicine and leave Symptoms out of the second."""
+
+    def generate_content(self, model=None, contents="", config=None):
+        response = super().generate_content(model=model, contents=contents, config=config)
+        records = json.loads(re.sub(r"^```json|```$", "", response.text, flags=re.MULTILINE))
+        if not isinstance(records, list):
+            return response
+        del records[1]["Symptoms"]
+        return self._response(json.dumps(records[1:]))
+
+
+def test_llm_data_batch_partial_answer(import_app):
+    fake = PartialBatchClient(latency=0, seed=0)
+    items = [(f"BATCH_{i}", f"Medicine {i}", "raw") for i in range(5)]
+    results = import_app.llm_data_batch(items, client=RateLimitedClient(fake))
+    assert fake.calls == 3  # the batch, then one call each for the two bad items
+    assert sorted(results) == [item[0] for item in items]
+    assert all(df.loc[0, "Category"] == "Analgesics" for df in results.values())
+
+
+def test_llm_data_batch_raises_transient_errors(import_app):
+    fake = FakeLLMClient(latency=0, error_rate=1.0, seed=0)
+    items = [(f"BATCH_{i}", f"Medicine {i}", "raw") for i in range(5)]
+    with pytest.raises(FakeLLMError):
+        import_app.llm_data_batch(items, client=RateLimitedClient(fake, max_retries=1))
+    assert fake.calls == 2  # no per-item fallback for a throttled batch
+
+
+def test_llm_data_does_not_stack_retries(import_app):
+    fake = FakeLLMClient(latency=0, error_rate=1.0, seed=0)
+    client = RateLimitedClient(fake, max_retries=2)
+    with pytest.raises(FakeLLMError):
+        import_app.llm_data("BATCH_1", "Dolo 650", "raw", client=client)
+    assert fake.calls == 3  # the client's retries only
+
+
+def test_llm_data_reasks_malformed_output(import_app):
+    fake = FakeLLMClient(latency=0, malformed_rate=1.0, seed=0)
+    client = RateLimitedClient(fake, max_retries=2)
+    df = import_app.llm_data("BATCH_1", "Dolo 650", "raw", client=client)
+    assert df.loc[0, "Category"] == "not_found"
+    assert fake.calls == 3 and client.stats()["retries"] == 0
+
+
+def test_llm_data_valid_answer(import_app):
+    fake = FakeLLMClient(latency=0, seed=0)
+    df = import_app.llm_data("BATCH_1", "Dolo 650", "raw", client=RateLimitedClient(fake))
+    assert df.loc[0, "Batch_ID"] == "BATCH_1" and df.loc[0, "Category"] == "Analgesics"
+    assert fake.calls == 1
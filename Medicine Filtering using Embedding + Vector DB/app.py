@@ -1,14 +1,23 @@
 import os
+import sys
 import warnings
-import re
 from flask import Flask, render_template, request, jsonify
-import pandas as pd
 import numpy as np
-from rapidfuzz import fuzz
-from sentence_transformers import SentenceTransformer
-import faiss
-from functools import lru_cache
 import logging
+import threading
+import time
+import search_engine
+from ranking import ranker_from_env
+from result_cache import ResultCache, result_key
+from search_engine import BATCH_ID_PATTERN, TEXT_ONLY_COLS, build_catalog, vector_search
+from serialization import (PageArgsError, StaleCursorError, format_frame, frame_to_records, json_response, paginate,
+                           parse_page_args, project)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.artifacts import load_catalog
+from common.catalog_sync import ChangeFeed, collection_from_env
+from common.encoders import load_encoder
+from common.metrics import install as install_metrics, register_encoder_gauges, register_gauge, stage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,179 +28,295 @@ os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 warnings.filterwarnings('ignore', category=DeprecationWarning)
 
 app = Flask(__name__)
+# Stage histograms on /metrics and a Server-Timing header (METRICS_ENABLED=0 turns both off)
+install_metrics(app)
+
+MAX_BULK_BATCH_IDS = int(os.getenv("MAX_BULK_BATCH_IDS", "1000"))
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "500"))
 
 # ---------------------- Load Data & Embeddings ----------------------
+# Prebuilt .npy/.faiss artifacts (python -m common.artifacts) are memory-mapped;
+# the embedding list columns are never loaded into dfe.
 try:
-    dfe = pd.read_parquet("embedding files/medicine_with_both_filters.parquet")
+    dfe, artifacts = load_catalog("embedding files/medicine_with_both_filters.parquet",
+                                  ["embedding_filter_2", "embedding_filter_3"])
+    # Only the indexes are kept: they hold the vectors (compressed with
+    # FAISS_INDEX_BACKEND=sq_fp16|sq8|pq), so no float32 matrix stays pinned
+    index1 = artifacts["embedding_filter_2"][1]
+    index2 = artifacts["embedding_filter_3"][1]
+    del artifacts
     logger.info("Loaded data: %s", dfe.shape)
+    logger.info("Loaded index1: %d x %d, index2: %d x %d", index1.ntotal, index1.d, index2.ntotal, index2.d)
 except Exception as e:
-    logger.error("Error loading parquet file: %s", e)
-    raise
-
-# Embeddings for vector search
-try:
-    embeddings1 = np.array(dfe["embedding_filter_2"].tolist(), dtype=np.float32)
-    embeddings2 = np.array(dfe["embedding_filter_3"].tolist(), dtype=np.float32)
-    logger.info("Loaded embeddings1: %s, embeddings2: %s", embeddings1.shape, embeddings2.shape)
-except Exception as e:
-    logger.error("Error processing embeddings: %s", e)
+    logger.error("Error loading data and FAISS indexes: %s", e)
     raise
 
-# Build FAISS indexes
+# Catalog snapshot: rows plus fuzzy text store, trigram and Batch_ID indexes.
+# FUZZY_PREFILTER=1 turns on the trigram prefilter; FUZZY_TRIGRAM_MIN_OVERLAP is its recall knob
+# (lower = more candidates, 0 = any shared trigram).
 try:
-    dim1 = embeddings1.shape[1]
-    dim2 = embeddings2.shape[1]
-    index1 = faiss.IndexFlatL2(dim1)
-    index2 = faiss.IndexFlatL2(dim2)
-    index1.add(embeddings1)
-    index2.add(embeddings2)
-    logger.info("FAISS indexes built successfully")
+    catalog = build_catalog(
+        dfe, index1, index2,
+        fuzzy_workers=int(os.getenv("FUZZY_WORKERS", "-1")),
+        use_trigrams=os.getenv("FUZZY_PREFILTER", "0") == "1",
+        trigram_min_overlap=float(os.getenv("FUZZY_TRIGRAM_MIN_OVERLAP", "0.25")),
+        trigram_max_candidates=int(os.getenv("FUZZY_MAX_CANDIDATES", "0")) or None,
+    )
 except Exception as e:
-    logger.error("Error building FAISS indexes: %s", e)
+    logger.error("Error building catalog search structures: %s", e)
     raise
 
-# Load multilingual sentence transformer
+# Load multilingual sentence transformer behind the shared embedding cache
+# (EMBEDDING_CACHE_MAX_MB, EMBEDDING_CACHE_PATH; see common/embedding_cache.py)
 try:
-    model = SentenceTransformer("intfloat/multilingual-e5-base")
-    logger.info("Model loaded: %s", model)
+    encoder = load_encoder()
+    logger.info("Model loaded: %s", encoder.model)
 except Exception as e:
     logger.error("Error loading model: %s", e)
     raise
 
-# Cache query encoding
-@lru_cache(maxsize=100)
-def encode_query(query):
-    return model.encode(query)
+encode_query = encoder.encode
+encode_queries = encoder.encode_many
+
+register_encoder_gauges(encoder)
+register_gauge("aushidi_catalog_rows", "Rows in the live catalog snapshot.", lambda: len(catalog))
+register_gauge("aushidi_index_vectors", "Vectors per FAISS index.",
+               lambda: {"embedding_filter_2": catalog.index1.ntotal, "embedding_filter_3": catalog.index2.ntotal},
+               label="index")
+
+# ---------------------- Incremental Catalog Sync ----------------------
+# Merges records added or changed by the Import Medicine app (MONGODB_URI) into
+# a new catalog snapshot: only new/changed text is embedded, the FAISS indexes
+# are updated with add_with_ids/remove_ids, and the snapshot is swapped in with
+# one assignment. Runs every CATALOG_SYNC_INTERVAL seconds and on POST /admin/sync;
+# after the first run only documents with a newer updated_at are read.
+sync_lock = threading.Lock()
+medicine_collection = collection_from_env()
+change_feed = ChangeFeed(medicine_collection) if medicine_collection is not None else None
+
+def sync_catalog():
+    global catalog
+    if change_feed is None:
+        raise RuntimeError("Catalog sync is not configured (set MONGODB_URI)")
+    with sync_lock:
+        records, deleted = change_feed.poll()
+        new_catalog, summary = search_engine.update_catalog(catalog, records, encoder.encode_documents, deleted)
+        catalog = new_catalog
+        change_feed.commit()
+    logger.info("Catalog sync: %s", summary)
+    return summary
+
+def sync_periodically(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            sync_catalog()
+        except Exception as e:
+            logger.error("Background catalog sync failed: %s", e)
+
+CATALOG_SYNC_INTERVAL = float(os.getenv("CATALOG_SYNC_INTERVAL", "0"))
+if medicine_collection is not None and CATALOG_SYNC_INTERVAL > 0:
+    threading.Thread(target=sync_periodically, args=(CATALOG_SYNC_INTERVAL,), daemon=True).start()
 
 # ---------------------- Search Pipeline ----------------------
-def search_medicine_pipeline(search_query, form_filter=None, top_k=100, fuzzy_threshold=50, vector_threshold=0.6):
-    try:
-        logger.info("Processing query: %s, form_filter: %s", search_query, form_filter or 'None')
-        
-        # Check if query is a Batch_ID (e.g., starts with "BATCH_")
-        if re.match(r'^BATCH_\d+$', search_query, re.IGNORECASE):
-            mask = dfe['Batch_ID'].str.contains(search_query, case=False, na=False)
-            results = dfe[mask].copy()
-            logger.info("Batch_ID search results: %d records", len(results))
-            if not results.empty:
-                results['relevance_score'] = 1.0  # Exact match, high relevance
-                drop_cols = ['embedding_filter_2', 'embedding_filter_3', 'filter_2', 'filter_3']
-                results = results.drop(columns=[col for col in drop_cols if col in results.columns])
-                return results
-            else:
-                logger.info("No records found for Batch_ID: %s", search_query)
+# See search_engine.py for the concurrency model: `catalog` is an immutable
+# snapshot, read once per request, and all per-query state stays local.
+# RANKING_STRATEGY picks the score fusion (priority, weighted, rrf); see ranking.py.
+ranker = ranker_from_env()
 
-        # --- Initialize results ---
-        results = []
+# Full results of repeated searches, scoped to catalog.version (RESULT_CACHE_*; see result_cache.py)
+result_cache = ResultCache.from_env()
+if result_cache is not None:
+    register_gauge("aushidi_result_cache_hit_ratio", "Search result cache hit ratio.",
+                   lambda: result_cache.stats()["hit_ratio"])
+    register_gauge("aushidi_result_cache_entries", "Search results held in memory.", lambda: len(result_cache))
 
-        # --- Fuzzy search (prioritized for exact keyword matches) ---
-        exclude_cols = ["Medicine Forms", "Price_INR", "Quantity_per_pack", "Total_Quantity",
-                        "embedding_filter_2", "embedding_filter_3", "filter_2", "filter_3"]
-        search_cols = [col for col in dfe.columns if col not in exclude_cols]
+def cached_results(snapshot, key):
+    return result_cache.get(snapshot.version, key) if result_cache is not None else None
 
-        def fuzzy_score(row):
-            return max([fuzz.partial_ratio(str(val).lower(), search_query.lower()) for val in row])
-        
-        dfe['fuzzy_score'] = dfe[search_cols].apply(fuzzy_score, axis=1)
-        result_fuzzy = dfe[dfe['fuzzy_score'] >= fuzzy_threshold].copy()
-        result_fuzzy['search_type'] = 'fuzzy'
-        logger.info("Fuzzy search results: %d records", len(result_fuzzy))
-        if not result_fuzzy.empty:
-            results.append(result_fuzzy)
-
-        # --- Vector search (embeddings1, k=5) ---
-        vec = encode_query(search_query)
-        svec = np.array(vec, dtype=np.float32).reshape(1, -1)
-        distances1, indices1 = index1.search(svec, k=5)
-        relevant_indices1 = [i for i, d in zip(indices1[0], distances1[0]) if d <= vector_threshold]
-        result_vec1 = dfe.loc[relevant_indices1].copy()
-        result_vec1['vector_score'] = [distances1[0][i] for i in range(len(relevant_indices1))]
-        result_vec1['search_type'] = 'vector1'
-        logger.info("Vector search (embeddings1): %d records", len(result_vec1))
-        if not result_vec1.empty:
-            results.append(result_vec1)
-
-        # --- Vector search (embeddings2, k=10) ---
-        distances2, indices2 = index2.search(svec, k=10)
-        relevant_indices2 = [i for i, d in zip(indices2[0], distances2[0]) if d <= vector_threshold]
-        result_vec2 = dfe.loc[relevant_indices2].copy()
-        result_vec2['vector_score'] = [distances2[0][i] for i in range(len(relevant_indices2))]
-        result_vec2['search_type'] = 'vector2'
-        logger.info("Vector search (embeddings2): %d records", len(result_vec2))
-        if not result_vec2.empty:
-            results.append(result_vec2)
-
-        # --- Combine results ---
-        if results:
-            results = pd.concat(results, ignore_index=True)
-            logger.info("Combined results before deduplication: %d records", len(results))
-        else:
-            logger.info("No results from fuzzy or vector searches")
-            return pd.DataFrame()
-
-        # --- Apply form filter if provided ---
-        if form_filter and form_filter != '':
-            results = results[results['Medicine Forms'] == form_filter].copy()
-            logger.info("Results after form filter (%s): %d records", form_filter, len(results))
-
-        # --- Safe deduplication using Batch_ID ---
-        if not results.empty:
-            results = results.drop_duplicates(subset=['Batch_ID']).reset_index(drop=True)
-            logger.info("Results after deduplication: %d records", len(results))
-
-            # --- Normalize scores ---
-            results['fuzzy_score_norm'] = results.get('fuzzy_score', 0) / 100
-            results['vector_score_norm'] = results.get('vector_score', 0) / results['vector_score'].max() if 'vector_score' in results and results['vector_score'].max() != 0 else 0
-            
-            # --- Combined relevance with priority to fuzzy matches ---
-            results['relevance_score'] = results.apply(
-                lambda x: 2.0 if x['search_type'] == 'fuzzy' else (1.0 + x['fuzzy_score_norm'] - x.get('vector_score_norm', 0)), axis=1
-            )
-            
-            # --- Sort by search_type (fuzzy first, then vector1, then vector2) and relevance ---
-            results['search_type_rank'] = results['search_type'].map({'fuzzy': 0, 'vector1': 1, 'vector2': 2})
-            results = results.sort_values(by=['search_type_rank', 'relevance_score'], ascending=[True, False]).head(top_k)
-            logger.info("Final results after sorting and top_k: %d records", len(results))
-
-        # Drop helper columns before returning
-        drop_cols = ['fuzzy_score', 'vector_score', 'fuzzy_score_norm', 'vector_score_norm', 
-                     'embedding_filter_2', 'embedding_filter_3', 'filter_2', 'filter_3', 'search_type', 'search_type_rank']
-        results = results.drop(columns=[col for col in drop_cols if col in results.columns])
-        
-        return results
-    except Exception as e:
-        logger.error("Error in search pipeline: %s", e)
-        return pd.DataFrame()
+def cache_results(snapshot, key, results_df):
+    # Empty frames are not cached: the pipeline also returns one when it fails
+    if result_cache is not None and not results_df.empty:
+        result_cache.put(snapshot.version, key, results_df)
+
+def search_medicine_pipeline(search_query, form_filter=None, snapshot=None, **kwargs):
+    snapshot = catalog if snapshot is None else snapshot
+    key = result_key(search_query, form_filter, ranker, **kwargs)
+    results_df = cached_results(snapshot, key)
+    if results_df is None:
+        results_df = search_engine.search_medicine_pipeline(snapshot, encode_query, search_query,
+                                                            form_filter=form_filter, ranker=ranker, **kwargs)
+        cache_results(snapshot, key, results_df)
+    return results_df
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/search', methods=['GET'])
-def search():
+def search_body(args):
+    """``(payload, status)`` of a /search request; shared with the ASGI route in asgi_app.py."""
     try:
-        query = request.args.get('query')
-        form_filter = request.args.get('form_filter', '')
+        query = args.get('query')
+        form_filter = args.get('form_filter') or ''
         
         if not query:
             logger.warning("No query provided in search request")
-            return jsonify({'error': 'No query provided'}), 400
+            return {'error': 'No query provided'}, 400
+        if not isinstance(form_filter, str):
+            return {'error': 'form_filter must be a string'}, 400
+        form_filter = form_filter.strip()
+        page = parse_page_args(args)
         
-        results_df = search_medicine_pipeline(query, form_filter=form_filter)
+        # The cursor is checked against the snapshot the results come from
+        snapshot = catalog
+        results_df = search_medicine_pipeline(query, form_filter=form_filter, snapshot=snapshot)
         
         if results_df.empty:
             logger.info("No results found for query: %s, filter: %s", query, form_filter or 'None')
-            return jsonify({'results': [], 'total': 0})
-        
-        results = results_df.to_dict(orient='records')
-        logger.info("Returning %d results for query: %s, filter: %s", len(results), query, form_filter or 'None')
-        return jsonify({
-            'results': results,
-            'total': len(results_df)
-        })
+        else:
+            logger.info("Returning %d results for query: %s, filter: %s", len(results_df), query, form_filter or 'None')
+        results, next_cursor = paginate(results_df, page, snapshot.version, query, form_filter)
+        body = {'results': results, 'total': len(results_df)}
+        if page['limit'] is not None or page['cursor']:
+            body['next_cursor'] = next_cursor
+        return body, 200
+    except StaleCursorError as e:
+        return {'error': str(e)}, 410
+    except PageArgsError as e:
+        return {'error': str(e)}, 400
     except Exception as e:
         logger.error("Error in search endpoint: %s", e)
-        return jsonify({'error': f'Search failed: {str(e)}'}), 500
+        return {'error': f'Search failed: {str(e)}'}, 500
+
+@app.route('/search', methods=['GET'])
+def search():
+    """Search; optional ``fields``, ``limit``/``cursor`` and ``format`` (see serialization.py)."""
+    body, status = search_body(request.args)
+    return json_response(body, status)
+
+@app.route('/admin/sync', methods=['POST'])
+def admin_sync():
+    try:
+        return jsonify(sync_catalog())
+    except Exception as e:
+        logger.error("Error in catalog sync: %s", e)
+        return jsonify({'error': f'Sync failed: {str(e)}'}), 500
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({'embedding_cache': encoder.cache.stats(), 'embedding_batches': encoder.model.stats(),
+                    'result_cache': result_cache.stats() if result_cache is not None else None})
+
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """Run many searches in one request: {"queries": [{"query": ..., "form_filter": ...}, ...]}.
+
+    Optional top-level ``fields`` and ``format`` apply to every query's results.
+
+    Queries with a cached result are answered from the result cache; the rest
+    are encoded with one model.encode call and each FAISS index is searched
+    once per distinct form_filter with the matching query vectors.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        items = payload.get('queries')
+        if not isinstance(items, list) or not items:
+            logger.warning("No queries provided in batch search request")
+            return jsonify({'error': 'No queries provided'}), 400
+        if len(items) > MAX_BATCH_QUERIES:
+            return jsonify({'error': f'At most {MAX_BATCH_QUERIES} queries per request'}), 400
+        items = [item if isinstance(item, dict) else {'query': item} for item in items]
+        if any(not isinstance(item.get('query'), str) or not item['query'] for item in items):
+            return jsonify({'error': 'Every item needs a non-empty query'}), 400
+        if any(not isinstance(item.get('form_filter') or '', str) for item in items):
+            return jsonify({'error': 'form_filter must be a string'}), 400
+        # The cache key and the search see the same normalized form_filter
+        items = [{'query': item['query'], 'form_filter': (item.get('form_filter') or '').strip()} for item in items]
+        page = parse_page_args({'fields': payload.get('fields'), 'format': payload.get('format')})
+
+        snapshot = catalog
+        keys = [result_key(item['query'], item['form_filter'], ranker) for item in items]
+        cached = {key: cached_results(snapshot, key) for key in dict.fromkeys(keys)}
+        # Cached queries and Batch_ID lookups that hit the index never reach the vector stage
+        to_encode = list(dict.fromkeys(
+            item['query'] for item, key in zip(items, keys)
+            if cached[key] is None
+            and not (BATCH_ID_PATTERN.match(item['query'].strip()) and snapshot.batch_index.lookup(item['query']))
+        ))
+        with stage("encode"):
+            vectors = dict(zip(to_encode, encode_queries(to_encode))) if to_encode else {}
+        # One FAISS call per index and form filter, restricted to that form's rows
+        by_form = {}
+        for item, key in zip(items, keys):
+            if cached[key] is None and item['query'] in vectors:
+                by_form.setdefault(item['form_filter'], {})[item['query']] = None
+        hits = {}
+        for form_filter, queries in by_form.items():
+            queries = list(queries)
+            with stage("vector_search"):
+                form_hits = vector_search(snapshot, np.stack([vectors[q] for q in queries]), form_filter)
+            hits.update({(q, form_filter): h for q, h in zip(queries, form_hits)})
+        logger.info("Batch search: %d queries, %d cached, %d encoded", len(items),
+                    sum(cached[key] is not None for key in keys), len(to_encode))
+
+        responses = []
+        for item, key in zip(items, keys):
+            query = item['query']
+            form_filter = item['form_filter']
+            results_df = cached[key]
+            if results_df is None:
+                results_df = search_engine.search_medicine_pipeline(snapshot, encode_query, query, form_filter=form_filter,
+                                                                    vector_hits=hits.get((query, form_filter)), ranker=ranker)
+                cache_results(snapshot, key, results_df)
+                cached[key] = results_df
+            responses.append({
+                'query': query,
+                'form_filter': form_filter,
+                'results': format_frame(project(results_df, page['fields']), page['format']),
+                'total': len(results_df),
+            })
+        return json_response({'results': responses, 'total': len(responses)})
+    except PageArgsError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error("Error in batch search endpoint: %s", e)
+        return jsonify({'error': f'Batch search failed: {str(e)}'}), 500
+
+@app.route('/search/batch_ids', methods=['POST'])
+def lookup_batch_ids():
+    """Resolve many scanned Batch_IDs in one request: {"batch_ids": [...], "fields": [...]}."""
+    try:
+        payload = request.get_json(silent=True) or {}
+        batch_ids = payload.get('batch_ids')
+        if not isinstance(batch_ids, list) or not batch_ids:
+            logger.warning("No batch_ids provided in bulk lookup request")
+            return jsonify({'error': 'No batch_ids provided'}), 400
+        if len(batch_ids) > MAX_BULK_BATCH_IDS:
+            return jsonify({'error': f'At most {MAX_BULK_BATCH_IDS} batch_ids per request'}), 400
+        page = parse_page_args({'fields': payload.get('fields')})
+
+        snapshot = catalog
+        matched = {}
+        missing = []
+        for batch_id in batch_ids:
+            row_ids = snapshot.batch_index.lookup(batch_id)
+            if row_ids:
+                matched[str(batch_id)] = row_ids
+            else:
+                missing.append(batch_id)
+
+        row_ids = list(dict.fromkeys(row_id for ids in matched.values() for row_id in ids))
+        rows = snapshot.df.loc[row_ids]
+        rows = project(rows.drop(columns=[col for col in TEXT_ONLY_COLS if col in rows.columns]), page['fields'])
+        records = dict(zip(rows.index, frame_to_records(rows)))
+        results = {batch_id: [records[row_id] for row_id in ids] for batch_id, ids in matched.items()}
+        logger.info("Bulk Batch_ID lookup: %d requested, %d found, %d missing", len(batch_ids), len(matched), len(missing))
+        return json_response({'results': results, 'missing': missing, 'total': len(matched)})
+    except PageArgsError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error("Error in bulk Batch_ID lookup: %s", e)
+        return jsonify({'error': f'Lookup failed: {str(e)}'}), 500
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
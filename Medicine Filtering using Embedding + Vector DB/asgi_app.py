@@ -0,0 +1,31 @@
+"""ASGI entry point: ``uvicorn asgi_app:app`` from this directory.
+
+/search is an async handler whose whole pipeline (encode, FAISS, fuzzy,
+ranking, serialization) runs on the bounded CPU pool of common/asgi.py;
+every other route is served by the Flask app in app.py.
+"""
+from starlette.responses import Response
+from starlette.routing import Route
+
+import app as flask_app
+from serialization import dumps
+
+from common.asgi import PoolBusy, asgi_app, busy_response, run_cpu
+from common.metrics import timed_endpoint
+
+
+def search_json(args):
+    body, status = flask_app.search_body(args)
+    return dumps(body), status
+
+
+@timed_endpoint("search")
+async def search(request):
+    try:
+        content, status = await run_cpu(search_json, request.query_params)
+    except PoolBusy:
+        return busy_response()
+    return Response(content, status_code=status, media_type="application/json")
+
+
+app = asgi_app([Route("/search", search, methods=["GET"])], flask_app.app)
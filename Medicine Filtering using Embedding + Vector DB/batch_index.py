@@ -0,0 +1,54 @@
+import re
+from collections import defaultdict
+
+BATCH_ID_PATTERN = re.compile(r'^BATCH_\d+$', re.IGNORECASE)
+
+
+def normalize_batch_id(batch_id):
+    return str(batch_id).strip().upper()
+
+
+class BatchIndex:
+    """Hash index from normalized Batch_ID to DataFrame row labels.
+
+    Replaces the ``str.contains`` scan for barcode lookups: a Batch_ID query
+    is an exact key lookup. Rows can be added, replaced or removed by label
+    as the catalog changes.
+    """
+
+    def __init__(self, df, column='Batch_ID'):
+        self.column = column
+        self.rows = defaultdict(list)
+        self.keys = {}
+        self.add_rows(df)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def copy(self):
+        """Independent copy to update while the original keeps serving lookups."""
+        clone = BatchIndex.__new__(BatchIndex)
+        clone.column = self.column
+        clone.rows = defaultdict(list, {key: list(rows) for key, rows in self.rows.items()})
+        clone.keys = dict(self.keys)
+        return clone
+
+    def add_rows(self, df):
+        """Index the rows of ``df``, replacing any row already indexed under the same label."""
+        self.remove_rows([row_id for row_id in df.index if row_id in self.keys])
+        for row_id, batch_id in zip(df.index, df[self.column].tolist()):
+            key = normalize_batch_id(batch_id)
+            self.keys[row_id] = key
+            self.rows[key].append(row_id)
+
+    def remove_rows(self, row_ids):
+        for row_id in row_ids:
+            key = self.keys.pop(row_id, None)
+            if key is None:
+                continue
+            self.rows[key].remove(row_id)
+            if not self.rows[key]:
+                del self.rows[key]
+
+    def lookup(self, batch_id):
+        return list(self.rows.get(normalize_batch_id(batch_id), ()))
@@ -0,0 +1,29 @@
+"""Stress check for concurrent calls to search_medicine_pipeline.
+
+Runs test_concurrency.py at a larger size:
+
+    python concurrency_check.py --rows 5000 --threads 16 --rounds 20
+
+Exits non-zero if any concurrent result differs from the serial run.
+"""
+import argparse
+import os
+import sys
+
+import pytest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    for name in ("rows", "queries", "threads", "rounds"):
+        os.environ[f"CONCURRENCY_{name.upper()}"] = str(getattr(args, name))
+    return pytest.main(["-q", os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_concurrency.py")])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+
+class FuzzyTextStore:
+    """Lowercased text of the searchable columns, built once at load time.
+
+    The values are stored column-major in one flat list so a query is scored
+    against every cell with a single ``process.cdist`` call instead of a
+    row-wise ``DataFrame.apply``.
+    """
+
+    def __init__(self, df, columns, workers=-1):
+        self.columns = list(columns)
+        self.n_rows = len(df)
+        self.workers = workers
+        # str(val).lower() per cell, exactly what the old row-wise scorer did
+        self.choices = [text for col in self.columns for text in df[col].astype(str).str.lower().tolist()]
+
+    def score(self, search_query, score_cutoff=0, rows=None):
+        """Return the best ``partial_ratio`` over all columns per row.
+
+        Cells scoring below ``score_cutoff`` are reported as 0, which leaves
+        every row at or above the cutoff with its exact score. ``rows``
+        restricts scoring to those row positions and returns one score each.
+        """
+        if rows is None:
+            choices, n_rows = self.choices, self.n_rows
+        else:
+            rows = list(rows)
+            choices = [self.choices[c * self.n_rows + r] for c in range(len(self.columns)) for r in rows]
+            n_rows = len(rows)
+        if not n_rows or not self.columns:
+            return np.zeros(n_rows, dtype=np.float64)
+        scores = process.cdist(
+            [search_query.lower()], choices,
+            scorer=fuzz.partial_ratio,
+            score_cutoff=score_cutoff,
+            dtype=np.float64,
+            workers=self.workers,
+        )
+        return scores.reshape(len(self.columns), n_rows).max(axis=0)
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Character-trigram inverted index used to prefilter fuzzy candidates.
+
+    ``min_overlap`` is the recall knob: a row is a candidate when it shares at
+    least that fraction of the query's trigrams (0 keeps every row sharing any
+    trigram). ``max_candidates`` caps the set, keeping the largest overlaps.
+    Rows are keyed by their DataFrame index label and can be added, replaced
+    or removed without rebuilding the whole index.
+    """
+
+    def __init__(self, df, columns, min_overlap=0.25, max_candidates=None):
+        self.columns = [col for col in columns if col in df.columns]
+        self.min_overlap = min_overlap
+        self.max_candidates = max_candidates
+        self.postings = defaultdict(set)
+        self.row_grams = {}
+        self.add_rows(df)
+
+    def __len__(self):
+        return len(self.row_grams)
+
+    def copy(self):
+        """Independent copy to update while the original keeps serving searches."""
+        clone = TrigramIndex.__new__(TrigramIndex)
+        clone.columns = list(self.columns)
+        clone.min_overlap = self.min_overlap
+        clone.max_candidates = self.max_candidates
+        clone.postings = defaultdict(set, {gram: set(rows) for gram, rows in self.postings.items()})
+        clone.row_grams = dict(self.row_grams)
+        return clone
+
+    def add_rows(self, df):
+        """Index the rows of ``df``, replacing any row already indexed under the same label."""
+        self.remove_rows([row_id for row_id in df.index if row_id in self.row_grams])
+        texts = [df[col].astype(str).str.lower().tolist() for col in self.columns]
+        for row_id, values in zip(df.index, zip(*texts)):
+            grams = set().union(*(trigrams(value) for value in values))
+            self.row_grams[row_id] = grams
+            for gram in grams:
+                self.postings[gram].add(row_id)
+
+    def remove_rows(self, row_ids):
+        for row_id in row_ids:
+            for gram in self.row_grams.pop(row_id, ()):
+                posting = self.postings[gram]
+                posting.discard(row_id)
+                if not posting:
+                    del self.postings[gram]
+
+    def candidates(self, search_query, min_overlap=None):
+        """Return candidate row labels, or None if the query is too short to filter on."""
+        grams = trigrams(search_query.lower())
+        if not grams:
+            return None
+        min_overlap = self.min_overlap if min_overlap is None else min_overlap
+        needed = max(1, math.ceil(min_overlap * len(grams)))
+        counts = Counter()
+        for gram in grams:
+            counts.update(self.postings.get(gram, ()))
+        ranked = counts.most_common(self.max_candidates) if self.max_candidates else counts.items()
+        return np.array(sorted(row_id for row_id, count in ranked if count >= needed), dtype=np.int64)
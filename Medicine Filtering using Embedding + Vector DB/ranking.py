@@ -0,0 +1,156 @@
+"""Score fusion and ranking of fuzzy / vector candidates on numpy arrays.
+
+Each retrieval stage hands over the row positions it found (in its own rank
+order) with their fuzzy scores and vector distances. ``rank_candidates``
+concatenates them, dedupes by Batch_ID and orders the survivors with a
+pluggable strategy, without building a DataFrame per stage:
+
+    priority   the original rule: fuzzy hits first (relevance 2.0), then
+               embeddings1 and embeddings2 hits by 1 + fuzzy/100 - distance/max
+    weighted   fuzzy_weight * fuzzy/100 + vector_weight * (1 - distance/threshold)
+    rrf        reciprocal rank fusion, sum over stages of 1 / (k + rank)
+
+Deduplication keeps the first occurrence of a Batch_ID (fuzzy before vector1
+before vector2), which is what ``priority`` ranks on; ``weighted`` and
+``rrf`` use the best fuzzy score and distance over all occurrences.
+"""
+import os
+
+import numpy as np
+
+
+class Stage:
+    """Candidates from one retrieval stage.
+
+    ``ranks`` (1-based, used by rrf) default to the order of ``positions``;
+    the fuzzy stage keeps catalog order and passes ranks by score.
+    """
+
+    def __init__(self, positions, fuzzy, vector=None, ranks=None):
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.fuzzy = np.asarray(fuzzy, dtype=np.float64)
+        self.vector = (np.full(len(self.positions), np.nan) if vector is None
+                       else np.asarray(vector, dtype=np.float64))
+        self.ranks = (np.arange(1, len(self.positions) + 1, dtype=np.float64) if ranks is None
+                      else np.asarray(ranks, dtype=np.float64))
+
+    @classmethod
+    def by_score(cls, positions, fuzzy):
+        fuzzy = np.asarray(fuzzy, dtype=np.float64)
+        ranks = np.empty(len(fuzzy))
+        ranks[np.argsort(-fuzzy, kind="stable")] = np.arange(1, len(fuzzy) + 1)
+        return cls(positions, fuzzy, ranks=ranks)
+
+
+class Fused:
+    """Deduped candidates, in first-occurrence order, with per-key signals."""
+
+    def __init__(self, positions, stage, fuzzy, vector, best_fuzzy, best_vector, rrf_terms):
+        self.positions = positions
+        self.stage = stage
+        self.fuzzy = fuzzy
+        self.vector = vector
+        self.best_fuzzy = best_fuzzy
+        self.best_vector = best_vector
+        self.rrf_terms = rrf_terms
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class PriorityRanker:
+    name = "priority"
+
+    def __call__(self, fused, vector_threshold):
+        vector = fused.vector
+        max_vector = np.nanmax(vector) if np.isfinite(vector).any() else np.nan
+        vector_norm = vector / max_vector if max_vector != 0 else np.zeros(len(fused))
+        relevance = np.where(fused.stage == 0, 2.0, 1.0 + fused.fuzzy / 100 - vector_norm)
+        # Stable: ties keep the dedupe order, like DataFrame.sort_values on two keys
+        return relevance, np.lexsort((-relevance, fused.stage))
+
+
+class WeightedRanker:
+    name = "weighted"
+
+    def __init__(self, fuzzy_weight=0.5, vector_weight=0.5):
+        self.fuzzy_weight = fuzzy_weight
+        self.vector_weight = vector_weight
+
+    def __call__(self, fused, vector_threshold):
+        similarity = np.clip(1.0 - fused.best_vector / vector_threshold, 0.0, 1.0) if vector_threshold else 0.0
+        similarity = np.nan_to_num(similarity, nan=0.0)
+        relevance = self.fuzzy_weight * fused.best_fuzzy / 100 + self.vector_weight * similarity
+        return relevance, np.argsort(-relevance, kind="stable")
+
+
+class RRFRanker:
+    name = "rrf"
+
+    def __init__(self, k=60):
+        self.k = k
+
+    def __call__(self, fused, vector_threshold):
+        relevance = fused.rrf_terms(self.k)
+        return relevance, np.argsort(-relevance, kind="stable")
+
+
+RANKERS = {"priority": PriorityRanker, "weighted": WeightedRanker, "rrf": RRFRanker}
+
+
+def ranker_from_env():
+    """RANKING_STRATEGY (priority|weighted|rrf), RANKING_FUZZY_WEIGHT, RANKING_VECTOR_WEIGHT, RANKING_RRF_K."""
+    strategy = os.getenv("RANKING_STRATEGY", "priority").lower()
+    if strategy == "weighted":
+        return WeightedRanker(float(os.getenv("RANKING_FUZZY_WEIGHT", "0.5")),
+                              float(os.getenv("RANKING_VECTOR_WEIGHT", "0.5")))
+    if strategy == "rrf":
+        return RRFRanker(int(os.getenv("RANKING_RRF_K", "60")))
+    if strategy != "priority":
+        raise ValueError(f"Unknown RANKING_STRATEGY {strategy!r}; expected one of {', '.join(RANKERS)}")
+    return PriorityRanker()
+
+
+def fuse(stages, batch_codes, keep=None):
+    """Concatenate ``stages`` and dedupe them on ``batch_codes`` (one code per catalog row).
+
+    ``keep`` is an optional boolean mask over catalog rows (e.g. the form filter).
+    """
+    positions = np.concatenate([stage.positions for stage in stages])
+    stage_ids = np.concatenate([np.full(len(stage.positions), i, dtype=np.int8) for i, stage in enumerate(stages)])
+    fuzzy = np.concatenate([stage.fuzzy for stage in stages])
+    vector = np.concatenate([stage.vector for stage in stages])
+    ranks = np.concatenate([stage.ranks for stage in stages])
+    if keep is not None:
+        mask = keep[positions]
+        positions, stage_ids, fuzzy, vector, ranks = (a[mask] for a in (positions, stage_ids, fuzzy, vector, ranks))
+
+    _, first, inverse = np.unique(batch_codes[positions], return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    kept = first[order]
+    # slot[u] = place of unique key u in first-occurrence order
+    slot = np.empty(len(order), dtype=np.int64)
+    slot[order] = np.arange(len(order))
+    owner = slot[inverse.ravel()]
+
+    best_fuzzy = np.full(len(kept), -np.inf)
+    np.maximum.at(best_fuzzy, owner, fuzzy)
+    best_vector = np.full(len(kept), np.nan)
+    np.fmin.at(best_vector, owner, vector)
+
+    def rrf_terms(k):
+        scores = np.zeros(len(kept))
+        np.add.at(scores, owner, 1.0 / (k + ranks))
+        return scores
+
+    return Fused(positions[kept], stage_ids[kept], fuzzy[kept], vector[kept], best_fuzzy, best_vector, rrf_terms)
+
+
+def rank_candidates(stages, batch_codes, ranker=None, top_k=100, vector_threshold=0.6, keep=None):
+    """Return ``(positions, relevance)`` of the top ``top_k`` deduped candidates, best first."""
+    fused = fuse(stages, batch_codes, keep)
+    if not len(fused):
+        return fused.positions, np.zeros(0)
+    relevance, order = (ranker or PriorityRanker())(fused, vector_threshold)
+    order = order[:top_k]
+    return fused.positions[order], np.asarray(relevance, dtype=np.float64)[order]
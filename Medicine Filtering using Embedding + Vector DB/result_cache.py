@@ -0,0 +1,181 @@
+"""Full-result cache for repeated searches.
+
+Entries are keyed on the normalized query (whitespace collapsed,
+case-folded, as in the embedding cache), the form filter, ``top_k`` and the
+other pipeline arguments, and the ranking strategy. They are scoped to the
+catalog version (``Catalog.version``): a new parquet or a catalog sync
+changes it, and the first lookup under a new version clears the in-memory
+entries. Entries also expire after a TTL, and the in-memory LRU is bounded by
+bytes. With a path configured, results are also kept in a local SQLite file
+shared by every worker on the host. Workers sync on their own schedule, so
+the file holds several versions at once; rows of old versions are only
+removed by the TTL and size pruning.
+
+    RESULT_CACHE_MAX_MB        in-memory budget, default 32 (0 turns the cache off)
+    RESULT_CACHE_TTL           seconds an entry stays valid, default 300
+    RESULT_CACHE_PATH          SQLite file shared by workers (unset = memory only)
+    RESULT_CACHE_MAX_ENTRIES   rows kept in the SQLite store, default 10000
+
+The SQLite store holds pickled DataFrames; keep the file private to the app.
+Cached frames are shared between requests and must not be modified.
+"""
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.embedding_cache import ENTRY_OVERHEAD_BYTES, normalize_query
+
+# Prune expired / surplus SQLite rows once every this many writes
+PRUNE_EVERY = 100
+
+
+def result_key(query, form_filter, ranker=None, **kwargs):
+    """Cache key for one search; ``kwargs`` are the remaining pipeline arguments (top_k, thresholds)."""
+    strategy = [ranker.name, sorted(vars(ranker).items())] if ranker is not None else None
+    return json.dumps([normalize_query(query), form_filter or "", strategy, sorted(kwargs.items())],
+                      ensure_ascii=False)
+
+
+class ResultCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=300.0, path=None, max_entries=10_000):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path
+        self.max_entries = max_entries
+        self.version = None
+        self._entries = OrderedDict()  # key -> (created, frame, cost)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.disk_hits = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " version TEXT NOT NULL, key TEXT NOT NULL, created REAL NOT NULL, frame BLOB NOT NULL,"
+                " PRIMARY KEY (version, key))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+
+    @classmethod
+    def from_env(cls):
+        """The configured cache, or None when RESULT_CACHE_MAX_MB is 0."""
+        max_mb = float(os.getenv("RESULT_CACHE_MAX_MB", "32"))
+        if max_mb <= 0:
+            return None
+        return cls(
+            max_bytes=int(max_mb * 1024 * 1024),
+            ttl=float(os.getenv("RESULT_CACHE_TTL", "300")),
+            path=os.getenv("RESULT_CACHE_PATH") or None,
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000")),
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _cost(key, frame):
+        return int(frame.memory_usage(index=True, deep=True).sum()) + sys.getsizeof(key) + ENTRY_OVERHEAD_BYTES
+
+    def _use_version(self, version):
+        """Drop in-memory entries of any other catalog version. Caller holds the lock."""
+        if version == self.version:
+            return
+        if self.version is not None:
+            self.invalidations += 1
+        self.version = version
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remember(self, key, created, frame):
+        """Insert into the in-memory LRU and evict down to the byte budget. Caller holds the lock."""
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[2]
+        cost = self._cost(key, frame)
+        self._entries[key] = (created, frame, cost)
+        self._bytes += cost
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, old_cost) = self._entries.popitem(last=False)
+            self._bytes -= old_cost
+            self.evictions += 1
+
+    def get(self, version, key):
+        """Return the cached result frame for ``key`` under catalog ``version``, or None."""
+        now = time.time()
+        with self._lock:
+            self._use_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._bytes -= self._entries.pop(key)[2]
+                self.expirations += 1
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, frame FROM results WHERE version = ? AND key = ? AND created >= ?",
+                    (version, key, now - self.ttl),
+                ).fetchone()
+                if row is not None:
+                    frame = pickle.loads(row[1])
+                    self._remember(key, row[0], frame)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return frame
+            self.misses += 1
+            return None
+
+    def put(self, version, key, frame):
+        created = time.time()
+        with self._lock:
+            self._use_version(version)
+            self._remember(key, created, frame)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (version, key, created, frame) VALUES (?, ?, ?, ?)",
+                    (version, key, created, pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)),
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    self._prune(created)
+        return frame
+
+    def _prune(self, now):
+        self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "disk_hits": self.disk_hits,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "catalog_version": self.version,
+                "persistent": self._db is not None,
+            }
@@ -0,0 +1,242 @@
+"""Search pipeline over an immutable catalog snapshot.
+
+Concurrency model
+-----------------
+A ``Catalog`` bundles the catalog rows with every structure derived from
+them: the fuzzy text store, trigram and Batch_ID indexes and both FAISS
+indexes. Once a Catalog is published it is never mutated.
+``search_medicine_pipeline`` only reads it and keeps all per-query state
+(scores, intermediate frames) in local variables, so any number of threads
+can search the same snapshot at once without locks.
+
+Form filters are pushed into retrieval: each Catalog keeps the row set of
+every ``Medicine Forms`` value, FAISS searches are restricted to it with an
+ID selector and the fuzzy stage only scores those rows, so top-k is filled
+from the requested form.
+
+Catalog updates (``update_catalog``) build a new Catalog copy-on-write and
+publish it with a single reference assignment. ``Catalog.version`` is a
+content hash of the rows, so every worker holding the same data agrees on
+it; result caches are scoped to it. Requests that are already running
+finish on the snapshot they started with. Encoding goes through the
+micro-batcher in ``common/embedding_service.py``: ``MicroBatcher`` is
+``thread_safe``, so ``CachedEncoder`` calls it without a lock and
+concurrent queries share one forward pass on the batcher's worker thread.
+"""
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from batch_index import BATCH_ID_PATTERN, BatchIndex
+from fuzzy_search import FuzzyTextStore, TrigramIndex
+from ranking import Stage, rank_candidates
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.catalog_sync import apply_updates
+from common.metrics import stage
+from common.text_fields import add_text_fields
+from common.vector_index import filtered_search_params, id_selector
+
+logger = logging.getLogger(__name__)
+
+FUZZY_EXCLUDE_COLS = ["Medicine Forms", "Price_INR", "Quantity_per_pack", "Total_Quantity",
+                      "embedding_filter_2", "embedding_filter_3", "filter_2", "filter_3"]
+# Columns used only for embedding/search, never returned to clients
+TEXT_ONLY_COLS = ['embedding_filter_2', 'embedding_filter_3', 'filter_2', 'filter_3']
+FORM_COL = 'Medicine Forms'
+NO_ROWS = np.zeros(0, dtype=np.int64)
+
+
+def catalog_version(df):
+    """Content hash of the catalog rows and labels, independent of the process that loaded them."""
+    if df.empty:
+        return "0"
+    hashed = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    # Row hashes are summed, and the uint64 sum wraps around
+    return f"{len(df)}-{int(hashed.sum(dtype=np.uint64)):016x}"
+
+
+class Catalog:
+    """Read-only snapshot of the catalog rows and their search structures."""
+
+    def __init__(self, df, index1, index2, fuzzy_store, batch_index, trigram_index=None, next_row_id=None):
+        self.df = df
+        self.index1 = index1
+        self.index2 = index2
+        self.fuzzy_store = fuzzy_store
+        self.batch_index = batch_index
+        self.trigram_index = trigram_index
+        # FAISS ids are DataFrame row labels; labels are never reused
+        if next_row_id is None:
+            next_row_id = int(df.index.max()) + 1 if len(df) else 0
+        self.next_row_id = next_row_id
+        # Row positions and FAISS selectors per Medicine Forms value
+        groups = df.groupby(FORM_COL).indices if FORM_COL in df.columns else {}
+        self.form_positions = {form: positions.astype(np.int64) for form, positions in groups.items()}
+        self.form_selectors = {form: id_selector(df.index[positions].to_numpy(dtype=np.int64))
+                               for form, positions in self.form_positions.items()}
+        self.forms = df[FORM_COL].to_numpy() if FORM_COL in df.columns else np.full(len(df), None)
+        # Integer Batch_ID codes per row position, for deduplication in the ranking stage
+        self.batch_codes = pd.factorize(df['Batch_ID'])[0] if 'Batch_ID' in df.columns else np.arange(len(df))
+        self.version = catalog_version(df)
+
+    def __len__(self):
+        return len(self.df)
+
+
+def build_catalog(df, index1, index2, fuzzy_workers=-1, use_trigrams=False, trigram_min_overlap=0.25,
+                  trigram_max_candidates=None):
+    search_cols = [col for col in df.columns if col not in FUZZY_EXCLUDE_COLS]
+    fuzzy_store = FuzzyTextStore(df, search_cols, workers=fuzzy_workers)
+    logger.info("Fuzzy text store built: %d columns x %d rows", len(search_cols), len(df))
+
+    trigram_index = None
+    if use_trigrams:
+        # Same columns as the fuzzy store, so a row is never dropped for a match in an unindexed column
+        trigram_index = TrigramIndex(df, search_cols, min_overlap=trigram_min_overlap,
+                                     max_candidates=trigram_max_candidates)
+        logger.info("Trigram index built: %d rows, %d trigrams", len(trigram_index), len(trigram_index.postings))
+
+    batch_index = BatchIndex(df)
+    logger.info("Batch_ID index built: %d rows", len(batch_index))
+    return Catalog(df, index1, index2, fuzzy_store, batch_index, trigram_index)
+
+
+def update_catalog(catalog, incoming, encode_documents, deleted=None):
+    """Return ``(new_catalog, summary)`` with ``incoming`` records merged in and ``deleted`` keys dropped.
+
+    Only new rows and rows whose filter_2/filter_3 text changed are embedded;
+    see common/catalog_sync.py. ``catalog`` itself is left untouched.
+    """
+    if not incoming.empty:
+        incoming = add_text_fields(incoming, ["filter_2", "filter_3"])
+    update = apply_updates(catalog.df, {"filter_2": catalog.index1, "filter_3": catalog.index2},
+                           catalog.next_row_id, incoming, encode_documents, deleted)
+    if not update.changed:
+        return catalog, update.summary()
+
+    df = update.df
+    fuzzy_store = FuzzyTextStore(df, catalog.fuzzy_store.columns, workers=catalog.fuzzy_store.workers)
+    touched = pd.concat([update.added, df.loc[update.updated.index]])
+    batch_index = catalog.batch_index.copy()
+    batch_index.remove_rows(update.removed)
+    batch_index.add_rows(touched)
+    trigram_index = None
+    if catalog.trigram_index is not None:
+        trigram_index = catalog.trigram_index.copy()
+        trigram_index.remove_rows(update.removed)
+        trigram_index.add_rows(touched)
+    new_catalog = Catalog(df, update.indexes["filter_2"], update.indexes["filter_3"], fuzzy_store, batch_index,
+                          trigram_index, next_row_id=update.next_row_id)
+    return new_catalog, update.summary()
+
+
+def vector_search(catalog, query_vectors, form_filter=None):
+    """Search both FAISS indexes with a (n_queries, dim) matrix, one call per index.
+
+    With ``form_filter`` only rows of that form are searched (none if the form
+    is unknown). Returns one ``((distances1, indices1), (distances2, indices2))``
+    pair per query.
+    """
+    svecs = np.ascontiguousarray(query_vectors, dtype=np.float32).reshape(-1, catalog.index1.d)
+    params1 = params2 = None
+    if form_filter:
+        selector = catalog.form_selectors.get(form_filter)
+        if selector is None:
+            empty = (np.zeros(0, dtype=np.float32), NO_ROWS)
+            return [(empty, empty)] * len(svecs)
+        params1 = filtered_search_params(catalog.index1, selector)
+        params2 = filtered_search_params(catalog.index2, selector)
+    distances1, indices1 = catalog.index1.search(svecs, k=5, params=params1)
+    distances2, indices2 = catalog.index2.search(svecs, k=10, params=params2)
+    return [((distances1[i], indices1[i]), (distances2[i], indices2[i])) for i in range(len(svecs))]
+
+
+def fuzzy_scores(catalog, search_query, fuzzy_threshold, form_filter=None):
+    """Best partial_ratio per row (0 below ``fuzzy_threshold``), aligned with ``catalog.df``.
+
+    Only rows of ``form_filter`` (when given) and trigram candidates are scored.
+    """
+    df = catalog.df
+    positions = catalog.form_positions.get(form_filter, NO_ROWS) if form_filter else None
+    candidate_ids = catalog.trigram_index.candidates(search_query) if catalog.trigram_index is not None else None
+    if candidate_ids is not None:
+        candidates = df.index.get_indexer(candidate_ids)
+        positions = candidates if positions is None else np.intersect1d(positions, candidates, assume_unique=True)
+    if positions is None:
+        return catalog.fuzzy_store.score(search_query, score_cutoff=fuzzy_threshold)
+    scores = np.zeros(len(df), dtype=np.float64)
+    scores[positions] = catalog.fuzzy_store.score(search_query, score_cutoff=fuzzy_threshold, rows=positions)
+    logger.info("Fuzzy prefilter: %d of %d rows scored", len(positions), len(df))
+    return scores
+
+
+def search_medicine_pipeline(catalog, encode_query, search_query, form_filter=None, top_k=100, fuzzy_threshold=50,
+                             vector_threshold=0.6, vector_hits=None, ranker=None):
+    """Run the Batch_ID / fuzzy / vector search for one query against ``catalog``.
+
+    ``vector_hits`` takes this query's precomputed entry from ``vector_search``
+    for the same ``form_filter`` (used by /search/batch); otherwise the query
+    is encoded with ``encode_query`` and searched here. ``ranker`` is a fusion
+    strategy from ranking.py (default: the fuzzy-first priority rule).
+    """
+    try:
+        logger.info("Processing query: %s, form_filter: %s", search_query, form_filter or 'None')
+        df = catalog.df
+
+        # Check if query is a Batch_ID (e.g., starts with "BATCH_")
+        if BATCH_ID_PATTERN.match(search_query.strip()):
+            with stage("batch_lookup"):
+                results = df.loc[catalog.batch_index.lookup(search_query)].copy()
+            logger.info("Batch_ID search results: %d records", len(results))
+            if not results.empty:
+                results['relevance_score'] = 1.0  # Exact match, high relevance
+                results = results.drop(columns=[col for col in TEXT_ONLY_COLS if col in results.columns])
+                return results
+            else:
+                logger.info("No records found for Batch_ID: %s", search_query)
+
+        # --- Fuzzy search (prioritized for exact keyword matches) ---
+        with stage("fuzzy"):
+            scores = fuzzy_scores(catalog, search_query, fuzzy_threshold, form_filter)
+            fuzzy_positions = np.flatnonzero(scores >= fuzzy_threshold)
+            stages = [Stage.by_score(fuzzy_positions, scores[fuzzy_positions])]
+        logger.info("Fuzzy search results: %d records", len(fuzzy_positions))
+
+        # --- Vector search (embeddings1 k=5, embeddings2 k=10) ---
+        if vector_hits is None:
+            with stage("encode"):
+                query_vector = encode_query(search_query)
+            with stage("vector_search"):
+                vector_hits = vector_search(catalog, query_vector, form_filter)[0]
+        with stage("vector_hits"):
+            for name, (distances, indices) in zip(("embeddings1", "embeddings2"), vector_hits):
+                # Ids without a row (-1 padding, vectors of replaced rows) are skipped
+                keep = (distances <= vector_threshold) & (indices >= 0)
+                positions = df.index.get_indexer(indices[keep])
+                found = positions >= 0
+                positions = positions[found]
+                # Exact fuzzy scores for the few vector hits (feed the fusion below the cutoff)
+                stages.append(Stage(positions, catalog.fuzzy_store.score(search_query, rows=positions),
+                                    vector=distances[keep][found]))
+                logger.info("Vector search (%s): %d records", name, len(positions))
+
+        if not any(len(stage.positions) for stage in stages):
+            logger.info("No results from fuzzy or vector searches")
+            return pd.DataFrame()
+
+        # --- Fuse, dedupe by Batch_ID and rank (form filter already applied in retrieval) ---
+        with stage("rank"):
+            keep = catalog.forms == form_filter if form_filter else None
+            positions, relevance = rank_candidates(stages, catalog.batch_codes, ranker, top_k, vector_threshold, keep)
+            results = df.iloc[positions].drop(columns=[col for col in TEXT_ONLY_COLS if col in df.columns])
+            results = results.reset_index(drop=True)
+            results['relevance_score'] = relevance
+        logger.info("Final results after ranking and top_k: %d records", len(results))
+        return results
+    except Exception as e:
+        logger.error("Error in search pipeline: %s", e)
+        return pd.DataFrame()
@@ -0,0 +1,179 @@
+"""JSON responses for search results: projection, pagination and formats.
+
+Result frames are converted column by column (``Series.tolist`` yields plain
+Python values in one pass) instead of ``to_dict(orient='records')``, and the
+payload is encoded with orjson when it is installed, which also serialises
+numpy scalars and arrays natively. NaN values become ``null``.
+
+Query parameters understood by ``parse_page_args``:
+
+    fields   comma-separated columns to return (default: all)
+    limit    page size (default: every result)
+    cursor   ``next_cursor`` of the previous page
+    format   ``records`` (default, list of row objects) or ``columns``
+             (``{"columns": [...], "data": {column: [values]}}``)
+"""
+import base64
+import json
+import math
+import os
+import sys
+import zlib
+
+import numpy as np
+import pandas as pd
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # falls back to the standard library encoder
+    orjson = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import stage
+
+FORMATS = ("records", "columns")
+
+
+class PageArgsError(ValueError):
+    """Invalid fields/limit/cursor/format parameter (reported as HTTP 400)."""
+
+
+class StaleCursorError(PageArgsError):
+    """Cursor issued for an older catalog snapshot (reported as HTTP 410)."""
+
+
+def _default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if value is pd.NA or value is pd.NaT:
+        return None
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _nan_to_none(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _nan_to_none(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_nan_to_none(item) for item in value]
+    return value
+
+
+def dumps(payload):
+    with stage("serialize"):
+        if orjson is not None:
+            return orjson.dumps(payload, default=_default,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(_nan_to_none(payload), default=_default, allow_nan=False).encode("utf-8")
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype="application/json")
+
+
+def column_values(series):
+    """Plain Python values of a column, NaN as None."""
+    values = series.tolist()
+    if series.dtype.kind in "fO" and series.isna().any():
+        mask = series.isna().to_numpy()
+        values = [None if missing else value for value, missing in zip(values, mask)]
+    return values
+
+
+def frame_to_records(df):
+    columns = [str(col) for col in df.columns]
+    values = [column_values(df[col]) for col in df.columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def frame_to_columns(df):
+    return {
+        "columns": [str(col) for col in df.columns],
+        "data": {str(col): column_values(df[col]) for col in df.columns},
+    }
+
+
+def format_frame(df, fmt="records"):
+    with stage("serialize"):
+        return frame_to_columns(df) if fmt == "columns" else frame_to_records(df)
+
+
+def _fingerprint(*parts):
+    return zlib.crc32("\x1f".join(str(part) for part in parts).encode("utf-8"))
+
+
+def encode_cursor(offset, version, *context):
+    token = json.dumps({"o": offset, "v": version, "c": _fingerprint(*context)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, version, *context):
+    """Offset stored in ``cursor``; it must have been issued for the same ``version`` and ``context``."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        token = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        offset, token_version, fingerprint = int(token["o"]), token["v"], token["c"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise PageArgsError("Invalid cursor") from e
+    if offset < 0 or fingerprint != _fingerprint(*context):
+        raise PageArgsError("Cursor does not belong to this query")
+    if token_version != version:
+        raise StaleCursorError("The catalog changed since this cursor was issued; search again")
+    return offset
+
+
+def parse_page_args(args):
+    """Read ``fields``, ``limit``, ``cursor`` and ``format`` from query args or a JSON body."""
+    fields = args.get("fields")
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    if fields is not None and not isinstance(fields, list):
+        raise PageArgsError("fields must be a comma-separated string or a list")
+    fields = [str(field).strip() for field in fields if str(field).strip()] if fields else None
+    limit = args.get("limit")
+    if limit is not None and limit != "":
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError) as e:
+            raise PageArgsError("limit must be an integer") from e
+        if limit <= 0:
+            raise PageArgsError("limit must be positive")
+    else:
+        limit = None
+    fmt = args.get("format") or "records"
+    if fmt not in FORMATS:
+        raise PageArgsError(f"format must be one of {', '.join(FORMATS)}")
+    return {"fields": fields, "limit": limit, "cursor": args.get("cursor") or None, "format": fmt}
+
+
+def project(df, fields):
+    if not fields:
+        return df
+    unknown = [field for field in fields if field not in df.columns]
+    if unknown and not df.empty:
+        raise PageArgsError(f"Unknown fields: {', '.join(unknown)}")
+    return df[[field for field in fields if field in df.columns]]
+
+
+def paginate(df, page, version, *context):
+    """Return ``(body, next_cursor)`` for one page of ``df``.
+
+    ``version`` (the catalog snapshot ``df`` came from) and ``context``
+    (query, filters, ...) are bound into the cursor, so it cannot be replayed
+    against a different search or against rows that have since changed.
+    """
+    df = project(df, page["fields"])
+    offset = decode_cursor(page["cursor"], version, *context) if page["cursor"] else 0
+    next_cursor = None
+    if page["limit"] is not None or offset:
+        stop = offset + page["limit"] if page["limit"] is not None else len(df)
+        if stop < len(df):
+            next_cursor = encode_cursor(stop, version, *context)
+        df = df.iloc[offset:stop]
+    return format_frame(df, page["format"]), next_cursor
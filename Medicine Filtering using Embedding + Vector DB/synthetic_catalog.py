@@ -0,0 +1,118 @@
+"""Synthetic medicine catalogs and a deterministic stub encoder.
+
+Lets the search pipeline run offline (no parquet, no model download) for the
+tests and benchmarks. Rows follow the columns of
+medicine_data_filter_2_3.xlsx.
+"""
+import os
+import sys
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from search_engine import build_catalog
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.text_fields import add_text_fields
+from common.vector_index import IndexConfig, build_index
+
+NAMES = ["Paracetamol", "Ibuprofen", "Cetirizine", "Azithromycin", "Amoxicillin", "Pantoprazole", "Omeprazole",
+         "Metformin", "Amlodipine", "Dolo", "Crocin", "Calpol", "Disprin", "Cyclopam", "Benadryl", "Ascoril",
+         "Montelukast", "Levocetirizine", "Ranitidine", "Ondansetron", "Loperamide", "Digene", "Gelusil", "Volini"]
+STRENGTHS = ["100mg", "250mg", "500mg", "650mg", "5ml", "10mg", "20mg", "40mg", "1g"]
+CATEGORIES = ["Antipyretics", "Analgesics", "Antibiotics", "Antihistamines", "Antacids", "Antidiabetics",
+              "Cough Suppressants", "Proton Pump Inhibitors", "Antispasmodics", "Anti-emetics", "Vitamins"]
+FORMS = ["Tablet", "Syrup", "Capsule", "Suspension", "Injection", "Cream", "Ointment", "Eye Drops", "Powder"]
+PACKS = ["10 Tablets", "15 Tablets", "60 ml Bottle", "100 ml Bottle", "1 Vial", "30 g Tube", "10 Capsules"]
+DISEASES = ["Fever", "Headache", "Cold", "Cough", "Acidity", "Diabetes", "Allergy", "Infection", "Body Pain",
+            "Stomach Pain", "Vomiting", "Diarrhea", "Joint Pain", "Hypertension"]
+SYMPTOMS = ["high fever", "body ache", "sneezing", "runny nose", "dry cough", "heartburn", "nausea", "itching",
+            "cramps", "loose motion", "swelling", "weakness", "chills", "sore throat"]
+SIDE_EFFECTS = ["nausea", "drowsiness", "rash", "dizziness", "dry mouth", "headache", "constipation"]
+HINGLISH = ["Yeh dawa {d} mein relief deti hai", "{d} ke liye achhi dawa hai, khane ke baad lein",
+            "Bachon ke {d} ke liye safe hai", "{d} aur dard dono kam karti hai"]
+
+
+def make_catalog_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+
+    def pick(values):
+        return [values[i] for i in rng.integers(0, len(values), n_rows)]
+
+    def keywords(values, k):
+        idx = rng.integers(0, len(values), (n_rows, k))
+        return [", ".join(dict.fromkeys(values[i] for i in row)) for row in idx]
+
+    diseases = keywords(DISEASES, 3)
+    df = pd.DataFrame({
+        "Batch_ID": [f"BATCH_{i + 1}" for i in range(n_rows)],
+        "Name of Medicine": [f"{n} {s}" for n, s in zip(pick(NAMES), pick(STRENGTHS))],
+        "Category": pick(CATEGORIES),
+        "Medicine Forms": pick(FORMS),
+        "Price_INR": rng.integers(10, 900, n_rows),
+        "Quantity_per_pack": pick(PACKS),
+        "Total_Quantity": rng.integers(0, 5000, n_rows),
+        "Cover Disease": diseases,
+        "Symptoms": keywords(SYMPTOMS, 3),
+        "Side Effects": keywords(SIDE_EFFECTS, 3),
+        "Instructions": [f"Take {d} dose after food, {h} hours apart" for d, h in
+                         zip(rng.integers(1, 3, n_rows), rng.integers(4, 12, n_rows))],
+        "Description in Hinglish": [template.format(d=d.split(", ")[0].lower())
+                                    for template, d in zip(pick(HINGLISH), diseases)],
+    })
+    return add_text_fields(df, ["filter_2", "filter_3"])
+
+
+class StubEncoder:
+    """Deterministic stand-in for SentenceTransformer.encode.
+
+    Hashes words and character trigrams into a fixed-size vector and
+    L2-normalises it, so near-identical texts land close together.
+    """
+
+    def __init__(self, dim=768):
+        self.dim = dim
+
+    def _encode_one(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        text = str(text).lower()
+        features = text.split() + [text[i:i + 3] for i in range(len(text) - 2)]
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def encode(self, texts, **kwargs):
+        if isinstance(texts, str):
+            return self._encode_one(texts)
+        if not len(texts):
+            return np.zeros((0, self.dim), np.float32)
+        # Synthetic catalogs repeat texts a lot; hash each distinct one once
+        codes, uniques = pd.factorize(pd.Series(list(texts), dtype=object).astype(str))
+        return np.stack([self._encode_one(text) for text in uniques])[codes]
+
+
+def sample_queries(df, n_queries, seed=0):
+    """``(query, form_filter)`` pairs mixing names, Batch_IDs, filter text, symptoms and a typo."""
+    rng = np.random.default_rng(seed)
+    rows = df.iloc[rng.integers(0, len(df), n_queries)]
+    forms = [''] + sorted(df['Medicine Forms'].unique().tolist())
+    queries = []
+    for i, (_, row) in enumerate(rows.iterrows()):
+        text = [row['Name of Medicine'].split()[0].lower(), row['Batch_ID'], row['filter_3'],
+                row['Symptoms'].split(', ')[0], 'fevr tablet'][i % 5]
+        queries.append((text, forms[i % len(forms)]))
+    return queries
+
+
+def build_synthetic_catalog(n_rows, dim=768, seed=0, index_config=None, **catalog_options):
+    """Return ``(catalog, encoder, embeddings1, embeddings2)`` for a synthetic catalog."""
+    df = make_catalog_frame(n_rows, seed)
+    encoder = StubEncoder(dim)
+    embeddings1 = encoder.encode(df["filter_2"].tolist())
+    embeddings2 = encoder.encode(df["filter_3"].tolist())
+    config = index_config or IndexConfig()
+    catalog = build_catalog(df, build_index(embeddings1, config), build_index(embeddings2, config), **catalog_options)
+    return catalog, encoder, embeddings1, embeddings2
@@ -0,0 +1,40 @@
+"""Concurrent calls to search_medicine_pipeline must match the serial run.
+
+Fires the same queries from many threads against one shared catalog snapshot
+(synthetic catalog, stub encoder). The sizes are small by default; the
+CONCURRENCY_* variables (or ``python concurrency_check.py``) scale them up.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("faiss")
+pytest.importorskip("rapidfuzz")
+
+import search_engine  # noqa: E402
+from synthetic_catalog import build_synthetic_catalog, sample_queries  # noqa: E402
+
+ROWS = int(os.getenv("CONCURRENCY_ROWS", "500"))
+QUERIES = int(os.getenv("CONCURRENCY_QUERIES", "20"))
+THREADS = int(os.getenv("CONCURRENCY_THREADS", "8"))
+ROUNDS = int(os.getenv("CONCURRENCY_ROUNDS", "3"))
+
+
+def test_concurrent_results_match_serial():
+    catalog, encoder, _, _ = build_synthetic_catalog(ROWS, dim=64)
+    queries = sample_queries(catalog.df, QUERIES)
+
+    def run(query, form_filter):
+        return search_engine.search_medicine_pipeline(catalog, encoder.encode, query, form_filter=form_filter)
+
+    serial = [run(query, form_filter) for query, form_filter in queries]
+
+    jobs = [i for _ in range(ROUNDS) for i in range(len(queries))]
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        concurrent = list(pool.map(lambda i: (i, run(*queries[i])), jobs))
+
+    mismatches = [queries[i] for i, result in concurrent if not result.equals(serial[i])]
+    assert not mismatches, f"{len(mismatches)} of {len(concurrent)} concurrent searches differ, e.g. {mismatches[:5]}"
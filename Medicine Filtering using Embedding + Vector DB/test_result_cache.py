@@ -0,0 +1,24 @@
+"""Tests for result_cache.py: run with ``python -m pytest`` from the repository root."""
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from result_cache import ResultCache  # noqa: E402
+
+
+def test_workers_on_different_versions_share_the_store(tmp_path):
+    path = str(tmp_path / "results.db")
+    old_worker, new_worker = ResultCache(path=path), ResultCache(path=path)
+    old_frame, new_frame = pd.DataFrame({"Batch_ID": ["BATCH_1"]}), pd.DataFrame({"Batch_ID": ["BATCH_2"]})
+
+    old_worker.put("v1", "fever", old_frame)
+    new_worker.put("v2", "fever", new_frame)
+    old_worker.put("v1", "cold", old_frame)
+    new_worker.put("v2", "cold", new_frame)
+
+    for key in ("fever", "cold"):
+        # A fresh worker reads both versions from disk, so neither write evicted the other
+        reader = ResultCache(path=path)
+        assert reader.get("v1", key).equals(old_frame)
+        assert reader.get("v2", key).equals(new_frame)
+        assert reader.stats()["disk_hits"] == 2
@@ -0,0 +1,42 @@
+"""Tests for the fuzzy stage of search_engine.py: run with ``python -m pytest`` from the repository root."""
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("faiss")
+pytest.importorskip("rapidfuzz")
+
+from search_engine import fuzzy_scores, search_medicine_pipeline  # noqa: E402
+from synthetic_catalog import build_synthetic_catalog  # noqa: E402
+
+QUERIES = ["paracetamol", "dolo 650", "fever", "bukhar", "cough syrup", "sneezing", "tablet", "xyz"]
+
+
+@pytest.fixture(scope="module")
+def catalogs():
+    full, encoder, _, _ = build_synthetic_catalog(300, dim=64)
+    prefiltered, _, _, _ = build_synthetic_catalog(300, dim=64, use_trigrams=True, trigram_min_overlap=0)
+    return full, prefiltered, encoder
+
+
+def test_prefilter_is_off_by_default(catalogs):
+    full, _, encoder = catalogs
+    assert full.trigram_index is None
+    results = search_medicine_pipeline(full, encoder.encode, "paracetamol")
+    assert not results.empty
+
+
+def test_prefilter_indexes_the_scored_columns(catalogs):
+    _, prefiltered, _ = catalogs
+    assert prefiltered.trigram_index.columns == prefiltered.fuzzy_store.columns
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_prefilter_keeps_full_scan_scores(catalogs, query):
+    full, prefiltered, _ = catalogs
+    expected = fuzzy_scores(full, query, 50)
+    scores = fuzzy_scores(prefiltered, query, 50)
+    candidates = prefiltered.df.index.isin(prefiltered.trigram_index.candidates(query))
+    # Candidate rows score exactly as in the full scan; only rows sharing no trigram are skipped
+    np.testing.assert_array_equal(scores[candidates], expected[candidates])
+    assert not scores[~candidates].any()
@@ -0,0 +1,32 @@
+"""Tests for the cursor pagination in serialization.py: run with ``python -m pytest`` from the repository root."""
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("flask")
+
+from serialization import PageArgsError, StaleCursorError, paginate, parse_page_args  # noqa: E402
+
+
+@pytest.fixture
+def results():
+    return pd.DataFrame({"Batch_ID": [f"BATCH_{i}" for i in range(5)], "Price_INR": range(5)})
+
+
+def test_cursor_pages_through_results(results):
+    body, cursor = paginate(results, parse_page_args({"limit": "2"}), "v1", "fever", "")
+    assert [row["Batch_ID"] for row in body] == ["BATCH_0", "BATCH_1"]
+    body, cursor = paginate(results, parse_page_args({"limit": "2", "cursor": cursor}), "v1", "fever", "")
+    assert [row["Batch_ID"] for row in body] == ["BATCH_2", "BATCH_3"] and cursor
+
+
+def test_cursor_rejects_other_query(results):
+    _, cursor = paginate(results, parse_page_args({"limit": "2"}), "v1", "fever", "")
+    with pytest.raises(PageArgsError) as error:
+        paginate(results, parse_page_args({"limit": "2", "cursor": cursor}), "v1", "cold", "")
+    assert not isinstance(error.value, StaleCursorError)
+
+
+def test_cursor_rejects_other_catalog_version(results):
+    _, cursor = paginate(results, parse_page_args({"limit": "2"}), "v1", "fever", "")
+    with pytest.raises(StaleCursorError):
+        paginate(results, parse_page_args({"limit": "2", "cursor": cursor}), "v2", "fever", "")
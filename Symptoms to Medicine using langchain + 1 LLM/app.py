@@ -2,57 +2,69 @@ from flask import Flask, render_template, request, jsonify
 import pandas as pd
 import numpy as np
 from google import genai
-from sentence_transformers import SentenceTransformer
-import faiss
 import os
+import sys
 import json
 import re
+import threading
+import time
 import dotenv
+from retrieval import retrieve
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.artifacts import load_catalog
+from common.catalog_sync import ChangeFeed, apply_updates, collection_from_env
+from common.encoders import load_encoder
+from common.metrics import install as install_metrics, register_encoder_gauges, register_gauge, stage
+from common.text_fields import add_text_fields
 
 app = Flask(__name__)
 dotenv.load_dotenv()
+# Stage histograms on /metrics and a Server-Timing header (METRICS_ENABLED=0 turns both off)
+install_metrics(app)
 
 client = genai.Client(api_key=os.getenv("GENAI_API_KEY_llm_data"))  
 
 try:
     current_dir = os.path.dirname(os.path.abspath(__file__))
     parquet_path = os.path.join(current_dir, "medicine_with_embeddings.parquet")
-    dfe = pd.read_parquet(parquet_path)
-    embeddings = np.array(dfe["embedding"].tolist())
-    dim = embeddings.shape[1]
-    faiss_index = faiss.IndexFlatL2(dim)
-    faiss_index.add(embeddings)
-    model = SentenceTransformer("intfloat/multilingual-e5-base")
+    # Memory-maps prebuilt artifacts from `python -m common.artifacts` when present
+    dfe, artifacts = load_catalog(parquet_path, ["embedding"])
+    # The index holds the vectors (compressed with FAISS_INDEX_BACKEND=sq_fp16|sq8|pq)
+    faiss_index = artifacts.pop("embedding")[1]
+    # Shared normalized embedding cache (EMBEDDING_CACHE_MAX_MB, EMBEDDING_CACHE_PATH)
+    encoder = load_encoder()
+    # (rows, index, next unused row id); replaced as a whole by sync_catalog
+    catalog = (dfe, faiss_index, int(dfe.index.max()) + 1 if len(dfe) else 0)
     print("FAISS index and model initialized successfully.")
 except Exception as e:
     print(f"Error initializing data: {e}")
     raise
 
+register_encoder_gauges(encoder)
+register_gauge("aushidi_catalog_rows", "Rows in the live catalog snapshot.", lambda: len(catalog[0]))
+register_gauge("aushidi_index_vectors", "Vectors per FAISS index.", lambda: {"embedding": catalog[1].ntotal},
+               label="index")
+
 def collect_data_for_advance(search_query, top_k=7):
     try:
-        query_vec = model.encode(search_query, convert_to_numpy=True).reshape(1, -1)
-        distances, indices = faiss_index.search(query_vec, k=top_k)
-        results = []
-        for idx, dist in zip(indices[0], distances[0]):
-            if idx != -1:
-                results.append({
-                    "Batch_ID": dfe.loc[idx, "Batch_ID"],
-                    "combined_text": dfe.loc[idx, "combined_text"],
-                    "Price_INR": dfe.loc[idx, "Price_INR"],
-                    "Quantity_per_pack": dfe.loc[idx, "Quantity_per_pack"],
-                })
+        df, index, _ = catalog
+        with stage("encode"):
+            query_vec = encoder.encode(search_query)
+        with stage("retrieve"):
+            results = retrieve(df, index, query_vec, top_k)
         print(f"collect_data_for_advance results: {results}")
         return results
     except Exception as e:
         print(f"Error in collect_data_for_advance: {e}")
         return []
 
-def llm(query, vector_result):
-    print(f"llm input - query: {query}, vector_result: {vector_result}")
-    if not vector_result:
-        return json.dumps({"error": "No matching medicines found."})
-    
-    response = client.models.generate_content(
+def generate_content(**kwargs):
+    with stage("llm"):
+        return client.models.generate_content(**kwargs)
+
+def llm_request(query, vector_result):
+    return dict(
         model="gemini-2.5-flash",
         contents=f"""
 You are a medical assistant AI. You will ONLY use the provided medicine records to answer.  
@@ -103,6 +115,8 @@ After the JSON array, return a single JSON key-value line for accuracy:
 - If no medicine matches the detected problem, return an empty "Medicines" list and note "No medicine found for this query."
 """
 )
+
+def llm_text(response):
     # Remove markdown code block if present
     text = response.text
     json_str = re.sub(r'^```json\n|\n```$', '', text, flags=re.MULTILINE).strip()
@@ -112,18 +126,82 @@ After the JSON array, return a single JSON key-value line for accuracy:
         print(f"Error processing LLM response: {e}")
         return json.dumps({"error": "Failed to process AI response."})
 
+def llm(query, vector_result):
+    print(f"llm input - query: {query}, vector_result: {vector_result}")
+    if not vector_result:
+        return json.dumps({"error": "No matching medicines found."})
+    return llm_text(generate_content(**llm_request(query, vector_result)))
+
+async def llm_async(query, vector_result):
+    """``llm`` over the native async Gemini client, for the ASGI route in asgi_app.py."""
+    print(f"llm input - query: {query}, vector_result: {vector_result}")
+    if not vector_result:
+        return json.dumps({"error": "No matching medicines found."})
+    with stage("llm"):
+        response = await client.aio.models.generate_content(**llm_request(query, vector_result))
+    return llm_text(response)
+
+# Incremental sync of medicines added by the Import Medicine app (MONGODB_URI):
+# only new/changed combined_text is embedded and the new snapshot is swapped in;
+# after the first run only documents with a newer updated_at are read
+sync_lock = threading.Lock()
+medicine_collection = collection_from_env()
+change_feed = ChangeFeed(medicine_collection) if medicine_collection is not None else None
+
+def sync_catalog():
+    global catalog
+    if change_feed is None:
+        raise RuntimeError("Catalog sync is not configured (set MONGODB_URI)")
+    with sync_lock:
+        df, index, next_row_id = catalog
+        records, deleted = change_feed.poll()
+        if not records.empty:
+            records = add_text_fields(records, ["combined_text"])
+        update = apply_updates(df, {"combined_text": index}, next_row_id, records, encoder.encode_documents, deleted)
+        if update.changed:
+            catalog = (update.df, update.indexes["combined_text"], update.next_row_id)
+        change_feed.commit()
+    print(f"Catalog sync: {update.summary()}")
+    return update.summary()
+
+def sync_periodically(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            sync_catalog()
+        except Exception as e:
+            print(f"Background catalog sync failed: {e}")
+
+CATALOG_SYNC_INTERVAL = float(os.getenv("CATALOG_SYNC_INTERVAL", "0"))
+if medicine_collection is not None and CATALOG_SYNC_INTERVAL > 0:
+    threading.Thread(target=sync_periodically, args=(CATALOG_SYNC_INTERVAL,), daemon=True).start()
+
 @app.route('/')
 def home():
     return render_template('index.html')
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({'embedding_cache': encoder.cache.stats(), 'embedding_batches': encoder.model.stats()})
+
+@app.route('/admin/sync', methods=['POST'])
+def admin_sync():
+    try:
+        return jsonify(sync_catalog())
+    except Exception as e:
+        print(f"Error in catalog sync: {e}")
+        return jsonify({"error": f"Sync failed: {str(e)}"}), 500
+
 @app.route('/search', methods=['POST'])
 def search():
     query = request.form['query']
     vector_result = collect_data_for_advance(query)
     response = llm(query, vector_result)
     try:
-        data = json.loads(response)
-        return jsonify(data)
+        with stage("parse"):
+            data = json.loads(response)
+        with stage("serialize"):
+            return jsonify(data)
     except json.JSONDecodeError as e:
         print(f"JSON Decode Error: {e}, Response: {response}")
         return jsonify({"error": "Invalid response format from AI."})
@@ -0,0 +1,41 @@
+"""ASGI entry point: ``uvicorn asgi_app:app`` from this directory.
+
+/search retrieves on the bounded CPU pool of common/asgi.py (encode + FAISS)
+and awaits Gemini through the async client, so requests waiting on the LLM
+hold no thread. Every other route is served by the Flask app in app.py.
+"""
+import json
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import app as flask_app
+
+from common.asgi import PoolBusy, asgi_app, busy_response, run_cpu
+from common.metrics import stage, timed_endpoint
+
+
+@timed_endpoint("search")
+async def search(request):
+    # The page posts application/x-www-form-urlencoded
+    form = parse_qs((await request.body()).decode("utf-8"))
+    if "query" not in form:
+        return JSONResponse({"error": "No query provided"}, status_code=400)
+    query = form["query"][0]
+    try:
+        vector_result = await run_cpu(flask_app.collect_data_for_advance, query)
+    except PoolBusy:
+        return busy_response()
+    response = await flask_app.llm_async(query, vector_result)
+    try:
+        with stage("parse"):
+            data = json.loads(response)
+        with stage("serialize"):
+            return JSONResponse(data)
+    except json.JSONDecodeError as e:
+        print(f"JSON Decode Error: {e}, Response: {response}")
+        return JSONResponse({"error": "Invalid response format from AI."})
+
+
+app = asgi_app([Route("/search", search, methods=["POST"])], flask_app.app)
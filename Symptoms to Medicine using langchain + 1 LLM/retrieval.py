@@ -0,0 +1,20 @@
+"""Vector retrieval behind collect_data_for_advance.
+
+Kept free of the app's startup (parquet, model, GenAI client) so the
+benchmarks can run it against a synthetic catalog.
+"""
+import numpy as np
+
+RESULT_COLS = ["Batch_ID", "combined_text", "Price_INR", "Quantity_per_pack"]
+
+
+def retrieve(df, index, query_vec, top_k=7):
+    """Top ``top_k`` catalog rows for one query vector, as LLM-ready dicts."""
+    query_vec = np.ascontiguousarray(query_vec, dtype=np.float32).reshape(1, -1)
+    distances, indices = index.search(query_vec, k=top_k)
+    results = []
+    for idx in indices[0]:
+        # -1 padding and vectors of replaced rows have no row
+        if idx in df.index:
+            results.append({col: df.loc[idx, col] for col in RESULT_COLS})
+    return results
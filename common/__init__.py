@@ -0,0 +1 @@
+"""Helpers shared by the Medicine Filtering and Symptoms to Medicine apps."""
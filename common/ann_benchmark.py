@@ -0,0 +1,128 @@
+"""Recall and latency of the FAISS backends on synthetic medicine catalogs.
+
+Run from the repository root, e.g.:
+
+    python -m common.ann_benchmark --sizes 10000 100000 1000000 --backends flat ivf_flat hnsw ivf_pq
+    python -m common.ann_benchmark --backends flat sq_fp16 sq8 pq \
+        --parquet "Medicine Filtering using Embedding + Vector DB/embedding files/medicine_with_both_filters.parquet" --column embedding_filter_2
+
+Catalog vectors are clustered and L2-normalised like multilingual-e5
+embeddings; queries are noisy copies of catalog rows. ``--parquet`` uses the
+real embeddings of ``--column`` instead (``--sizes`` is then ignored). For
+every backend the harness reports recall@k against the exact flat index,
+p50/p99 latency of single-query searches (the shape of a /search request),
+sweeping nprobe for IVF backends and efSearch for HNSW, and the index size in
+memory next to its ratio to the flat index.
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from common.vector_index import BACKENDS, IndexConfig, apply_search_params, build_index, index_bytes
+
+SWEEPS = {
+    "flat": [None],
+    "ivf_flat": [1, 4, 16, 64],
+    "ivf_pq": [1, 4, 16, 64],
+    "hnsw": [16, 32, 64, 128],
+    "sq_fp16": [None],
+    "sq8": [None],
+    "pq": [None],
+}
+
+
+def synthetic_catalog(n_rows, dim=768, n_clusters=256, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim), dtype=np.float32)
+    matrix = np.empty((n_rows, dim), dtype=np.float32)
+    chunk = 100_000
+    for start in range(0, n_rows, chunk):
+        stop = min(start + chunk, n_rows)
+        labels = rng.integers(0, n_clusters, stop - start)
+        matrix[start:stop] = centers[labels] + 0.5 * rng.standard_normal((stop - start, dim), dtype=np.float32)
+    faiss.normalize_L2(matrix)
+    return matrix
+
+
+def synthetic_queries(matrix, n_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    queries = matrix[rng.integers(0, len(matrix), n_queries)].copy()
+    queries += 0.05 * rng.standard_normal(queries.shape, dtype=np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def latency_ms(index, queries, k):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query.reshape(1, -1), k)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99))
+
+
+def run(sizes, backends, dim, n_queries, k, threads, matrix=None):
+    if threads:
+        faiss.omp_set_num_threads(threads)
+    report = []
+    catalogs = [matrix] if matrix is not None else (synthetic_catalog(n_rows, dim) for n_rows in sizes)
+    for matrix in catalogs:
+        n_rows = len(matrix)
+        queries = synthetic_queries(matrix, n_queries)
+        truth = None
+        for backend in backends:
+            start = time.perf_counter()
+            index = build_index(matrix, IndexConfig(backend=backend))
+            build_s = time.perf_counter() - start
+            if truth is None:
+                exact = index if backend == "flat" else build_index(matrix, IndexConfig(backend="flat"))
+                _, truth = exact.search(queries, k)
+                flat_bytes = index_bytes(exact)
+            size = index_bytes(index)
+            for knob in SWEEPS[backend]:
+                config = IndexConfig(backend=backend)
+                if knob is not None:
+                    config.nprobe = config.ef_search = knob
+                apply_search_params(index, config)
+                _, found = index.search(queries, k)
+                p50, p99 = latency_ms(index, queries, k)
+                row = {
+                    "rows": n_rows, "backend": backend, "knob": knob,
+                    f"recall@{k}": round(recall_at_k(found, truth), 4),
+                    "p50_ms": round(p50, 3), "p99_ms": round(p99, 3), "build_s": round(build_s, 2),
+                    "index_mb": round(size / (1024 * 1024), 1), "size_vs_flat": round(size / flat_bytes, 3),
+                }
+                report.append(row)
+                print(" ".join(f"{key}={value}" for key, value in row.items()), flush=True)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k and latency of FAISS backends on synthetic catalogs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=0, help="FAISS OpenMP threads (0 = library default)")
+    parser.add_argument("--parquet", help="benchmark the embeddings stored in this parquet instead")
+    parser.add_argument("--column", default="embedding_filter_2", help="embedding column of --parquet")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+    matrix = None
+    if args.parquet:
+        from common.artifacts import read_embedding_matrix
+
+        matrix = read_embedding_matrix(args.parquet, args.column)
+    results = run(args.sizes, args.backends, args.dim, args.queries, args.k, args.threads, matrix)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
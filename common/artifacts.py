@@ -0,0 +1,161 @@
+"""Prebuilt embedding matrices and FAISS indexes stored next to a parquet file.
+
+Build them once, offline, from the repository root:
+
+    python -m common.artifacts "Medicine Filtering using Embedding + Vector DB/embedding files/medicine_with_both_filters.parquet" embedding_filter_2 embedding_filter_3
+    python -m common.artifacts "Symptoms to Medicine using langchain + 1 LLM/medicine_with_embeddings.parquet" embedding
+
+For every embedding column this writes ``<stem>.<column>.npy`` (contiguous
+float32) and ``<stem>.<column>.faiss``, plus ``<stem>.artifacts.json`` which
+records the parquet it was built from. The apps memory-map these files, so
+startup no longer depends on the catalog size. The codes of flat and
+scalar/product-quantized indexes (faiss >= 1.9) and IVF inverted lists stay
+read-only mappings that worker processes on one host share through the OS
+page cache; other structures (HNSW graphs, IVF quantizers) are read into
+each process. A faiss build that cannot map an index reads it into memory
+instead. With a compressed backend
+(``sq_fp16``, ``sq8``, ``pq``, ``ivf_pq``) the index holds the only copy of
+the embeddings and no .npy is written; the matrix slot is then ``None``.
+"""
+import argparse
+import json
+import logging
+import os
+
+import faiss
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from common.vector_index import BACKENDS, COMPRESSED_BACKENDS, IndexConfig, apply_search_params, build_index
+
+logger = logging.getLogger(__name__)
+
+
+def artifact_paths(parquet_path, column):
+    stem = os.path.splitext(parquet_path)[0]
+    return f"{stem}.{column}.npy", f"{stem}.{column}.faiss"
+
+
+def manifest_path(parquet_path):
+    return os.path.splitext(parquet_path)[0] + ".artifacts.json"
+
+
+def _source_fingerprint(parquet_path):
+    stat = os.stat(parquet_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _mmap_io_flags():
+    """Memory-mapping read flags to try in order, most shared first."""
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    # faiss >= 1.9 can also map the codes of flat indexes, but then refuses IVF files
+    mmap_ifc = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    return ([flags | mmap_ifc] if mmap_ifc else []) + [flags]
+
+
+def read_mapped_index(index_path):
+    """Read ``index_path`` with the first of ``_mmap_io_flags`` this faiss build accepts, else into memory."""
+    for io_flags in _mmap_io_flags():
+        try:
+            return faiss.read_index(index_path, io_flags)
+        except RuntimeError as e:
+            logger.info("Could not read %s with io_flags=%#x: %s", index_path, io_flags, e)
+    logger.warning("%s could not be memory-mapped; reading it into memory", index_path)
+    return faiss.read_index(index_path)
+
+
+def read_embedding_matrix(parquet_path, column):
+    """Read a list<float> parquet column straight into a float32 matrix."""
+    values = pq.read_table(parquet_path, columns=[column]).column(column).combine_chunks()
+    flat = values.flatten().to_numpy(zero_copy_only=False)
+    return np.ascontiguousarray(flat.reshape(len(values), -1), dtype=np.float32)
+
+
+def build_artifacts(parquet_path, columns, config=None):
+    config = config or IndexConfig.from_env()
+    manifest = {"source": _source_fingerprint(parquet_path), "index": config.build_params(), "columns": {}}
+    for column in columns:
+        matrix = read_embedding_matrix(parquet_path, column)
+        matrix_path, index_path = artifact_paths(parquet_path, column)
+        keep_matrix = config.backend not in COMPRESSED_BACKENDS
+        if keep_matrix:
+            np.save(matrix_path, matrix)
+        faiss.write_index(build_index(matrix, config), index_path)
+        manifest["rows"] = len(matrix)
+        manifest["columns"][column] = {
+            "dim": int(matrix.shape[1]),
+            "matrix": os.path.basename(matrix_path) if keep_matrix else None,
+            "index": os.path.basename(index_path),
+        }
+        logger.info("Wrote %s %s and %s", column, matrix.shape, index_path)
+    with open(manifest_path(parquet_path), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_artifacts(parquet_path, columns, config):
+    """Memory-map prebuilt artifacts, or return None if missing or stale."""
+    try:
+        with open(manifest_path(parquet_path)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if manifest.get("source") != _source_fingerprint(parquet_path):
+        logger.warning("Artifacts for %s are stale (parquet changed since build)", parquet_path)
+        return None
+    if manifest.get("index") != config.build_params():
+        logger.warning("Artifacts for %s were built as %s but %s is configured",
+                       parquet_path, manifest.get("index"), config.build_params())
+        return None
+    if any(column not in manifest["columns"] for column in columns):
+        return None
+
+    artifacts = {}
+    for column in columns:
+        matrix_path, index_path = artifact_paths(parquet_path, column)
+        matrix = np.load(matrix_path, mmap_mode="r") if manifest["columns"][column]["matrix"] else None
+        index = read_mapped_index(index_path)
+        artifacts[column] = (matrix, apply_search_params(index, config))
+    return artifacts
+
+
+def load_catalog(parquet_path, embedding_columns, config=None):
+    """Load the catalog rows and one ``(matrix, index)`` pair per embedding column.
+
+    The embedding list columns are never materialised in the returned frame.
+    Without prebuilt artifacts the matrices and indexes are built in memory,
+    which is the old (slow) startup path. ``config`` defaults to the
+    ``FAISS_*`` environment settings (see common/vector_index.py).
+    """
+    config = config or IndexConfig.from_env()
+    embedding_columns = list(embedding_columns)
+    artifacts = load_artifacts(parquet_path, embedding_columns, config)
+    if artifacts is None:
+        logger.warning("No prebuilt artifacts for %s, building in memory; run `python -m common.artifacts` to speed up startup", parquet_path)
+        artifacts = {}
+        for column in embedding_columns:
+            matrix = read_embedding_matrix(parquet_path, column)
+            index = build_index(matrix, config)
+            # The index holds its own (possibly compressed) copy
+            artifacts[column] = (None if config.backend in COMPRESSED_BACKENDS else matrix, index)
+    else:
+        logger.info("Memory-mapped prebuilt artifacts for %s", parquet_path)
+
+    other_columns = [name for name in pq.read_schema(parquet_path).names
+                     if name not in embedding_columns and not name.startswith("__index_level_")]
+    df = pd.read_parquet(parquet_path, columns=other_columns)
+    return df, artifacts
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Build mmap-able embedding matrices and FAISS indexes next to a parquet file.")
+    parser.add_argument("parquet_path")
+    parser.add_argument("columns", nargs="+", help="embedding list columns, e.g. embedding_filter_2 embedding_filter_3")
+    parser.add_argument("--backend", choices=BACKENDS, help="default: FAISS_INDEX_BACKEND or flat")
+    args = parser.parse_args()
+    config = IndexConfig.from_env()
+    if args.backend:
+        config.backend = args.backend
+    build_artifacts(args.parquet_path, args.columns, config)
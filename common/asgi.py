@@ -0,0 +1,73 @@
+"""ASGI serving mode for the Filtering and Symptoms apps.
+
+Each app's ``asgi_app.py`` serves its hot endpoint with a native async
+handler and mounts the unchanged Flask app for every other route. Run from
+the app directory:
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+
+CPU-bound stages (encode, FAISS, fuzzy) go to one bounded thread pool with
+``run_cpu``; network-bound stages (Gemini) are awaited directly, so a
+request waiting on the LLM holds no thread at all.
+
+    ASGI_CPU_WORKERS   threads for CPU-bound stages (default: CPU count)
+    ASGI_MAX_PENDING   CPU jobs queued or running before requests get 503 (default 4 * workers)
+
+Threads rather than processes: numpy, FAISS, RapidFuzz and torch release the
+GIL in their kernels, and threads share one copy of the catalog, indexes and
+model, so more in-flight requests cost no extra memory. Concurrent encodes
+still coalesce in the micro-batcher (common/embedding_service.py).
+"""
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from common.metrics import register_gauge
+
+CPU_WORKERS = int(os.getenv("ASGI_CPU_WORKERS", "0")) or os.cpu_count() or 4
+MAX_PENDING = int(os.getenv("ASGI_MAX_PENDING", "0")) or 4 * CPU_WORKERS
+
+_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu-stage")
+_pending = 0
+
+register_gauge("aushidi_cpu_pool_pending", "CPU-bound jobs queued or running on the ASGI pool.", lambda: _pending)
+
+
+class PoolBusy(Exception):
+    """The CPU pool already holds ``ASGI_MAX_PENDING`` jobs."""
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Run ``fn`` on the CPU pool; its stage timers still reach the current request."""
+    global _pending
+    if _pending >= MAX_PENDING:
+        raise PoolBusy(f"{_pending} CPU jobs pending")
+    # run_in_executor does not carry context variables over on its own
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_pool, call)
+    finally:
+        _pending -= 1
+
+
+def busy_response():
+    from starlette.responses import JSONResponse
+
+    return JSONResponse({"error": "Server busy, retry shortly"}, status_code=503, headers={"Retry-After": "1"})
+
+
+def asgi_app(routes, flask_app):
+    """Starlette app serving ``routes`` natively and everything else through ``flask_app``."""
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+
+    try:
+        from a2wsgi import WSGIMiddleware
+    except ImportError:
+        from starlette.middleware.wsgi import WSGIMiddleware
+
+    # Mounted Flask routes run on the WSGI adapter's own threads
+    return Starlette(routes=list(routes) + [Mount("/", app=WSGIMiddleware(flask_app))])
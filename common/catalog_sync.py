@@ -0,0 +1,271 @@
+"""Incremental catalog sync from the ``oct_medicines`` collection.
+
+Records added or changed by the Import Medicine app are merged into a
+running app without re-embedding the whole catalog:
+
+* rows are matched on (Batch_ID, Name of Medicine);
+* new rows, and rows whose embedded text changed, are encoded and added to
+  the FAISS indexes with ``add_with_ids`` (changed rows get a fresh id and
+  their old id is dropped with ``remove_ids``);
+* rows where only other fields changed (price, quantity) are updated
+  without touching the indexes;
+* rows whose document was deleted are dropped along with their vectors.
+
+``ChangeFeed`` reads only what changed since the previous sync.
+
+All updates are copy-on-write: the DataFrame and indexes passed in are never
+modified, so the caller can publish the result with a single assignment
+while searches keep running on the previous snapshot. ``collection`` can be
+any pymongo-compatible collection, including ``mongomock``.
+"""
+import logging
+import os
+
+import faiss
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+KEY_COLS = ["Batch_ID", "Name of Medicine"]
+
+
+def collection_from_env():
+    """Return the oct_medicines collection from MONGODB_URI, or None when sync is not configured."""
+    uri = os.getenv("MONGODB_URI")
+    if not uri:
+        return None
+    from pymongo import MongoClient
+    client = MongoClient(uri)
+    return client[os.getenv("MONGODB_DB", "medicine_db")][os.getenv("MONGODB_COLLECTION", "oct_medicines")]
+
+
+def fetch_records(collection, query=None):
+    # updated_at is write bookkeeping of the Import app, not a catalog field
+    return pd.DataFrame(list(collection.find(query or {}, {"_id": 0, "updated_at": 0})))
+
+
+def _key(doc):
+    return tuple(doc.get(col) for col in KEY_COLS)
+
+
+class ChangeFeed:
+    """Incremental reader of the collection for periodic syncs.
+
+    The first ``poll`` reads every document. Later polls read only documents
+    whose ``updated_at`` (set by the Import app's bulk writer) is at or after
+    the newest one already seen; ``$gte`` re-reads that instant so writes
+    sharing its timestamp are not missed, and re-read rows diff as unchanged.
+    Each poll also lists the keys, projected to (Batch_ID, Name of Medicine)
+    so the bulk writer's unique index covers the scan: keys that disappeared
+    are deletions, and new keys without ``updated_at`` (written by other
+    tools) are fetched by Batch_ID.
+
+    The high-water mark only moves on ``commit``, once the caller has applied
+    the poll, so a failed sync is retried in full.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.last_seen = None
+        self.keys = None
+        self._pending = None
+
+    def poll(self):
+        """Return ``(records, deleted)``: the changed documents and the keys of deleted ones."""
+        # Keys first: a document inserted in between is then fetched twice rather than never
+        keys = {_key(doc) for doc in self.collection.find({}, {"_id": 0, **{col: 1 for col in KEY_COLS}})}
+        query = {"updated_at": {"$gte": self.last_seen}} if self.last_seen is not None else {}
+        docs = list(self.collection.find(query, {"_id": 0}))
+        stamps = [stamp for stamp in (doc.pop("updated_at", None) for doc in docs) if stamp is not None]
+        deleted = []
+        if self.keys is not None:
+            deleted = list(self.keys - keys)
+            unseen = keys - self.keys - {_key(doc) for doc in docs}
+            if unseen:
+                more = self.collection.find({"Batch_ID": {"$in": list({key[0] for key in unseen})}},
+                                            {"_id": 0, "updated_at": 0})
+                docs.extend(doc for doc in more if _key(doc) in unseen)
+        self._pending = (max(stamps, default=self.last_seen), keys)
+        return pd.DataFrame(docs), pd.DataFrame(deleted, columns=KEY_COLS)
+
+    def commit(self):
+        """Advance past the last ``poll`` after its changes were applied."""
+        if self._pending is not None:
+            self.last_seen, self.keys = self._pending
+            self._pending = None
+
+
+def values_differ(new, old):
+    """Elementwise ``new != old`` that ignores dtype drift between Mongo and parquet.
+
+    Nulls (NaN, None, NaT) equal each other, and values that are both numeric
+    compare as numbers (``25 == 25.0``, numpy == Python scalars); everything
+    else compares as text.
+    """
+    new_null, old_null = new.isna().to_numpy(), old.isna().to_numpy()
+    new_num = pd.to_numeric(new, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    old_num = pd.to_numeric(old, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    numeric = ~np.isnan(new_num) & ~np.isnan(old_num)
+    differ = np.where(numeric, new_num != old_num, new.astype(str).to_numpy() != old.astype(str).to_numpy())
+    return np.where(new_null | old_null, new_null != old_null, differ)
+
+
+def diff_records(current, incoming, text_cols):
+    """Split ``incoming`` into new rows, rows whose ``text_cols`` changed and rows with other changes.
+
+    Matched rows carry the label of the current row in ``_row_id``.
+    """
+    incoming = incoming.drop_duplicates(subset=KEY_COLS, keep="last")
+    compare_cols = [col for col in incoming.columns if col in current.columns and col not in KEY_COLS]
+    existing = current[KEY_COLS + compare_cols].drop_duplicates(subset=KEY_COLS, keep="last")
+    existing = existing.rename_axis("_row_id").reset_index()
+    merged = incoming.merge(existing, on=KEY_COLS, how="left", suffixes=("", "_current"), indicator=True)
+
+    def changed(cols):
+        mask = np.zeros(len(merged), dtype=bool)
+        for col in cols:
+            mask |= values_differ(merged[col], merged[f"{col}_current"])
+        return mask
+
+    matched = (merged["_merge"] == "both").to_numpy()
+    text_changed = matched & changed([col for col in text_cols if col in compare_cols])
+    other_changed = matched & ~text_changed & changed([col for col in compare_cols if col not in text_cols])
+
+    keep = list(incoming.columns)
+    new_rows = merged.loc[~matched, keep]
+    return new_rows, merged.loc[text_changed, keep + ["_row_id"]], merged.loc[other_changed, keep + ["_row_id"]]
+
+
+def _array_invlists(invlists):
+    """In-memory copy of (possibly memory-mapped) IVF inverted lists."""
+    copy = faiss.ArrayInvertedLists(invlists.nlist, invlists.code_size)
+    for list_no in range(invlists.nlist):
+        size = invlists.list_size(list_no)
+        if size:
+            ids, codes = invlists.get_ids(list_no), invlists.get_codes(list_no)
+            copy.add_entries(list_no, size, ids, codes)
+            invlists.release_ids(list_no, ids)
+            invlists.release_codes(list_no, codes)
+    return copy
+
+
+def owned_index(index):
+    """Writable in-memory copy of ``index``, also when common/artifacts.py memory-mapped it.
+
+    ``faiss.clone_index`` cannot copy mapped IVF lists and crashes on flat
+    codes backed by the read-only mapping, so the index goes through a
+    serialize/deserialize round trip instead; mapped IVF lists are copied
+    list by list.
+    """
+    data = faiss.serialize_index(index)
+    ivf = faiss.try_extract_index_ivf(index)
+    invlists = faiss.downcast_InvertedLists(ivf.invlists) if ivf is not None else None
+    if invlists is None or isinstance(invlists, faiss.ArrayInvertedLists):
+        return faiss.deserialize_index(data)
+    copy = faiss.deserialize_index(data, faiss.IO_FLAG_SKIP_IVF_DATA)
+    lists = _array_invlists(invlists)
+    faiss.extract_index_ivf(copy).replace_invlists(lists, True)
+    lists.this.disown()  # owned by the index now
+    return copy
+
+
+def updated_index(index, remove_ids, vectors, ids):
+    """Copy ``index``, drop ``remove_ids`` and add ``vectors`` under ``ids``."""
+    index = owned_index(index)
+    if len(remove_ids):
+        try:
+            index.remove_ids(np.asarray(remove_ids, dtype=np.int64))
+        except RuntimeError as e:
+            # HNSW cannot delete; the stale vectors stay but their ids no longer map to a row
+            logger.warning("Index cannot remove ids (%s); replaced rows are skipped at search time", e)
+    if len(ids):
+        index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), np.asarray(ids, dtype=np.int64))
+    return index
+
+
+class CatalogUpdate:
+    """Result of ``apply_updates``: the new rows/indexes and what changed."""
+
+    def __init__(self, df, indexes, next_row_id, removed, added, updated, deleted):
+        self.df = df
+        self.indexes = indexes
+        self.next_row_id = next_row_id
+        # Every row id dropped from df and the indexes; deleted ones are also in ``deleted``
+        self.removed = removed
+        self.added = added
+        self.updated = updated
+        self.deleted = deleted
+
+    @property
+    def changed(self):
+        return bool(len(self.removed) or len(self.added) or len(self.updated))
+
+    def summary(self):
+        reembedded = len(self.removed) - len(self.deleted)
+        return {
+            "new": len(self.added) - reembedded,
+            "reembedded": reembedded,
+            "updated": len(self.updated),
+            "deleted": len(self.deleted),
+            "rows": len(self.df),
+        }
+
+
+def assign_rows(df, updated):
+    """Write every column of ``updated`` into the same rows of ``df``, nulls included.
+
+    Unlike ``DataFrame.update``, a value cleared in the collection is cleared
+    here too. A column that cannot hold the new values (e.g. a null in an
+    integer column) is widened first.
+    """
+    for col in updated.columns:
+        values = updated[col].infer_objects()
+        try:
+            df.loc[updated.index, col] = values
+        except (TypeError, ValueError):
+            column = df[col].astype(object)
+            column.loc[updated.index] = values
+            df[col] = column.infer_objects()
+
+
+def apply_updates(df, indexes, next_row_id, incoming, encode_documents, deleted=None):
+    """Merge ``incoming`` records into ``df`` and its FAISS indexes, copy-on-write.
+
+    ``indexes`` maps each embedded text column (already built on ``incoming``)
+    to the FAISS index holding its vectors under the row labels of ``df``.
+    ``next_row_id`` is the first label never used before; replaced rows are
+    given new labels so ids are never reused. ``deleted`` holds the keys of
+    documents removed from the collection (see ``ChangeFeed``).
+    """
+    text_cols = list(indexes)
+    if incoming.empty:
+        incoming = pd.DataFrame(columns=KEY_COLS + text_cols)
+    new_rows, text_changed, other_changed = diff_records(df, incoming, text_cols)
+
+    deleted_ids = np.zeros(0, dtype=np.int64)
+    if deleted is not None and len(deleted):
+        gone = pd.MultiIndex.from_frame(df[KEY_COLS]).isin(pd.MultiIndex.from_frame(deleted[KEY_COLS]))
+        deleted_ids = df.index[gone].to_numpy(dtype=np.int64)
+
+    updated = other_changed.set_index("_row_id")
+    updated = updated[[col for col in updated.columns if col in df.columns]]
+    removed = np.concatenate([text_changed["_row_id"].to_numpy(dtype=np.int64), deleted_ids])
+    added = pd.concat([text_changed.drop(columns="_row_id"), new_rows]).reindex(columns=df.columns)
+    added.index = pd.RangeIndex(next_row_id, next_row_id + len(added))
+
+    if not (len(removed) or len(added) or len(updated)):
+        return CatalogUpdate(df, indexes, next_row_id, removed, added, updated, deleted_ids)
+
+    new_df = df.copy()
+    if len(updated):
+        assign_rows(new_df, updated)
+    new_df = pd.concat([new_df.drop(index=removed), added])
+
+    new_indexes = {}
+    for col, index in indexes.items():
+        vectors = encode_documents(added[col].astype(str).tolist()) if len(added) else np.zeros((0, index.d), np.float32)
+        new_indexes[col] = updated_index(index, removed, vectors, added.index.to_numpy(dtype=np.int64))
+    update = CatalogUpdate(new_df, new_indexes, next_row_id + len(added), removed, added, updated, deleted_ids)
+    logger.info("Catalog update: %s", update.summary())
+    return update
@@ -0,0 +1,204 @@
+"""Build the embedding parquet files the apps load, re-encoding only what changed.
+
+Replaces the notebook cells that built ``filter_2`` / ``filter_3`` /
+``combined_text`` and ran ``model.encode`` over the whole catalog. Run from
+the repository root:
+
+    # Filtering app: filter_2 + filter_3 -> medicine_with_both_filters.parquet
+    python -m common.embedding_build --app filtering \\
+        --source "Medicine Filtering using Embedding + Vector DB/medicine_data_filter_2_3.xlsx"
+
+    # Symptoms app: combined_text -> medicine_with_embeddings.parquet, catalog from MongoDB
+    python -m common.embedding_build --app symptoms --source mongo --workers 4 --artifacts
+
+``--source`` is an .xlsx/.csv/.parquet file or ``mongo`` (MONGODB_URI, see
+common/catalog_sync.py). Every text is hashed together with the model name
+and EMBEDDING_BACKEND;
+vectors whose hash already appears in the previous output (``--previous``,
+default: the output file) are reused, so a rebuild after an import only
+encodes new or edited rows. The rest is encoded in ``--batch-size`` chunks,
+spread over ``--workers`` processes that each load the model once.
+``--artifacts`` also rebuilds the memory-mapped .npy/.faiss files.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.artifacts import build_artifacts, read_embedding_matrix
+from common.text_fields import add_text_fields
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMBEDDING_COLUMNS = {"filter_2": "embedding_filter_2", "filter_3": "embedding_filter_3", "combined_text": "embedding"}
+APPS = {
+    "filtering": (["filter_2", "filter_3"], os.path.join(
+        ROOT, "Medicine Filtering using Embedding + Vector DB", "embedding files", "medicine_with_both_filters.parquet")),
+    "symptoms": (["combined_text"], os.path.join(
+        ROOT, "Symptoms to Medicine using langchain + 1 LLM", "medicine_with_embeddings.parquet")),
+}
+
+
+def read_source(source):
+    if source == "mongo":
+        from common.catalog_sync import collection_from_env, fetch_records
+
+        collection = collection_from_env()
+        if collection is None:
+            raise SystemExit("--source mongo needs MONGODB_URI")
+        return fetch_records(collection)
+    ext = os.path.splitext(source)[1].lower()
+    if ext in (".xlsx", ".xls"):
+        return pd.read_excel(source)
+    if ext == ".csv":
+        return pd.read_csv(source)
+    if ext == ".parquet":
+        columns = [name for name in pq.read_schema(source).names
+                   if name not in EMBEDDING_COLUMNS.values() and not name.startswith("__index_level_")]
+        return pd.read_parquet(source, columns=columns)
+    raise SystemExit(f"Unsupported source {source!r}; use .xlsx, .csv, .parquet or mongo")
+
+
+def text_hashes(texts, namespace):
+    prefix = namespace.encode("utf-8") + b"\x1f"
+    return [hashlib.blake2b(prefix + str(text).encode("utf-8"), digest_size=16).hexdigest() for text in texts]
+
+
+def previous_vectors(path, field, namespace):
+    """``{text hash: row}`` and the matrix of a previous build, or ``({}, None)``."""
+    column = EMBEDDING_COLUMNS[field]
+    if not path or not os.path.exists(path):
+        return {}, None
+    names = pq.read_schema(path).names
+    if field not in names or column not in names:
+        return {}, None
+    texts = pd.read_parquet(path, columns=[field])[field].tolist()
+    matrix = read_embedding_matrix(path, column)
+    return {h: row for row, h in enumerate(text_hashes(texts, namespace))}, matrix
+
+
+_worker_model = None
+
+
+def _init_worker(model_name, threads):
+    global _worker_model
+    if threads:
+        try:
+            import torch
+
+            torch.set_num_threads(threads)
+        except ImportError:  # ONNX-only install
+            pass
+    from common.encoders import load_model
+
+    _worker_model = load_model(model_name)[0]
+
+
+def _encode_chunk(texts):
+    return np.asarray(_worker_model.encode(texts), dtype=np.float32)
+
+
+def encode_texts(texts, model_name, batch_size=64, workers=1):
+    """Encode ``texts`` in ``batch_size`` chunks over ``workers`` processes (1 = in-process)."""
+    chunks = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+    if not chunks:
+        return np.zeros((0, 0), dtype=np.float32)
+    if workers <= 1:
+        if _worker_model is None:
+            _init_worker(model_name, 0)
+        return np.concatenate([_encode_chunk(chunk) for chunk in chunks])
+    # Split the cores between workers so they don't oversubscribe each other
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_name, threads)) as pool:
+        return np.concatenate(list(pool.map(_encode_chunk, chunks)))
+
+
+def hash_namespace(model_name):
+    from common.encoders import backend_tag, cache_namespace
+
+    return cache_namespace(model_name, backend_tag())
+
+
+def embed_field(df, field, model_name, previous, batch_size, workers):
+    """Return the (rows, dim) matrix for ``df[field]``, reusing unchanged vectors from ``previous``."""
+    texts = df[field].astype(str).tolist()
+    namespace = hash_namespace(model_name)
+    hashes = text_hashes(texts, namespace)
+    known, old_matrix = previous_vectors(previous, field, namespace)
+
+    # Encode each distinct new text once
+    todo = list(dict.fromkeys(h for h in hashes if h not in known))
+    text_of = dict(zip(hashes, texts))
+    start = time.perf_counter()
+    encoded = encode_texts([text_of[h] for h in todo], model_name, batch_size, workers)
+    logger.info("%s: %d rows, %d reused, %d distinct texts encoded in %.1fs",
+                field, len(texts), len(texts) - sum(h not in known for h in hashes), len(todo),
+                time.perf_counter() - start)
+
+    dim = encoded.shape[1] if len(todo) else (old_matrix.shape[1] if old_matrix is not None else 0)
+    matrix = np.empty((len(texts), dim), dtype=np.float32)
+    new_row = {h: i for i, h in enumerate(todo)}
+    for row, h in enumerate(hashes):
+        matrix[row] = old_matrix[known[h]] if h in known else encoded[new_row[h]]
+    return matrix
+
+
+def list_array(matrix):
+    """Wrap a (rows, dim) matrix as a list<float> column without building Python lists."""
+    offsets = pa.array(np.arange(len(matrix) + 1, dtype=np.int32) * matrix.shape[1])
+    return pa.ListArray.from_arrays(offsets, pa.array(matrix.ravel()))
+
+
+def build(source, fields, output, model_name, previous=None, batch_size=64, workers=1, artifacts=False):
+    df = read_source(source).reset_index(drop=True)
+    df = add_text_fields(df, fields)
+    previous = output if previous is None else previous
+    matrices = {field: embed_field(df, field, model_name, previous, batch_size, workers) for field in fields}
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for field, matrix in matrices.items():
+        table = table.append_column(EMBEDDING_COLUMNS[field], list_array(matrix))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    tmp_path = output + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, output)
+    logger.info("Wrote %s (%d rows)", output, len(df))
+
+    if artifacts:
+        build_artifacts(output, [EMBEDDING_COLUMNS[field] for field in fields])
+
+
+def main():
+    from common.encoders import MODEL_NAME
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=sorted(APPS), help="preset fields and output path")
+    parser.add_argument("--source", required=True, help=".xlsx/.csv/.parquet catalog or 'mongo'")
+    parser.add_argument("--fields", nargs="+", choices=sorted(EMBEDDING_COLUMNS), help="text fields to embed")
+    parser.add_argument("--output", help="parquet to write")
+    parser.add_argument("--previous", help="earlier build to reuse vectors from (default: --output)")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1, help="encoder processes, each loads the model")
+    parser.add_argument("--artifacts", action="store_true", help="also rebuild the .npy/.faiss artifacts")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    fields, output = APPS[args.app] if args.app else (None, None)
+    fields = args.fields or fields
+    output = args.output or output
+    if not fields or not output:
+        parser.error("give --app or both --fields and --output")
+    build(args.source, fields, output, args.model, args.previous, args.batch_size, args.workers, args.artifacts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Query-embedding cache shared by the Filtering and Symptoms encoders.
+
+Entries are keyed on normalized query text (whitespace collapsed,
+case-folded), so "Fever", "fever " and "FEVER" cost one forward pass. Only
+the key is normalized: the model encodes the query as typed, with its
+whitespace collapsed, and the first spelling seen fills the entry. The
+in-memory LRU is bounded by bytes rather than entry count. When a path is
+configured, embeddings are also written to a local SQLite store that
+survives restarts and is shared by every process pointing at it.
+
+    EMBEDDING_CACHE_MAX_MB   in-memory budget, default 64
+    EMBEDDING_CACHE_PATH     SQLite file for the persistent store (unset = memory only)
+"""
+import contextlib
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Rough per-entry bookkeeping cost (OrderedDict node, ndarray header)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_query(text):
+    return " ".join(str(text).split()).casefold()
+
+
+class EmbeddingCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, path=None, namespace=""):
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.path = path
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+
+    @classmethod
+    def from_env(cls, namespace=""):
+        return cls(
+            max_bytes=int(float(os.getenv("EMBEDDING_CACHE_MAX_MB", "64")) * 1024 * 1024),
+            path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+            namespace=namespace,
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _cost(key, vector):
+        return vector.nbytes + sys.getsizeof(key) + ENTRY_OVERHEAD_BYTES
+
+    def _remember(self, key, vector):
+        """Insert into the in-memory LRU and evict down to the byte budget. Caller holds the lock."""
+        if key in self._entries:
+            self._bytes -= self._cost(key, self._entries.pop(key))
+        self._entries[key] = vector
+        self._bytes += self._cost(key, vector)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            old_key, old_vector = self._entries.popitem(last=False)
+            self._bytes -= self._cost(old_key, old_vector)
+            self.evictions += 1
+
+    def get(self, key):
+        """Return the cached vector for a normalized key, or None."""
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE namespace = ? AND key = ?", (self.namespace, key)
+                ).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def put(self, key, vector):
+        vector = np.array(vector, dtype=np.float32).ravel()
+        vector.flags.writeable = False
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (namespace, key, vector) VALUES (?, ?, ?)",
+                    (self.namespace, key, vector.tobytes()),
+                )
+        return vector
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_hits": self.disk_hits,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "persistent": self._db is not None,
+            }
+
+
+class CachedEncoder:
+    """SentenceTransformer-style encoder in front of an EmbeddingCache.
+
+    ``encode`` handles one query and ``encode_many`` a list, sending only the
+    cache misses to the model in a single batch. Calls into a bare model are
+    serialized because its tokenizer is not thread-safe; models marked
+    ``thread_safe`` (the micro-batcher, the service client) are called
+    concurrently so requests can share batches.
+    """
+
+    def __init__(self, model, cache):
+        self.model = model
+        self.cache = cache
+        if getattr(model, "thread_safe", False):
+            self._model_lock = contextlib.nullcontext()
+        else:
+            self._model_lock = threading.Lock()
+
+    def encode(self, text):
+        return self.encode_many([text])[0]
+
+    def encode_many(self, texts):
+        keys = [normalize_query(text) for text in texts]
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        vectors, spellings = {}, {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                vectors[key] = self.cache.get(key)
+                spellings[key] = " ".join(str(text).split())
+        missing = [key for key, vector in vectors.items() if vector is None]
+        if missing:
+            with self._model_lock:
+                encoded = np.asarray(self.model.encode([spellings[key] for key in missing]),
+                                     dtype=np.float32).reshape(len(missing), -1)
+            for key, vector in zip(missing, encoded):
+                vectors[key] = self.cache.put(key, vector)
+        return np.stack([vectors[key] for key in keys])
+
+    def encode_documents(self, texts):
+        """Encode catalog text as-is, bypassing query normalization and the cache."""
+        texts = list(texts)
+        if hasattr(self.model, "encode_documents"):
+            # The micro-batcher runs these behind queued queries
+            return np.asarray(self.model.encode_documents(texts), dtype=np.float32).reshape(len(texts), -1)
+        with self._model_lock:
+            return np.asarray(self.model.encode(texts), dtype=np.float32).reshape(len(texts), -1)
@@ -0,0 +1,290 @@
+"""Shared embedding service with dynamic micro-batching.
+
+``MicroBatcher`` wraps a SentenceTransformer behind a single worker thread.
+Concurrent ``encode`` calls are queued; whenever the model is free the worker
+takes everything waiting (up to ``max_batch_size`` texts, optionally holding
+the first request for ``max_wait_ms`` so more can join) and encodes it in one
+forward pass. An idle worker starts on a lone query at once, so single-query
+latency stays bounded while throughput grows with load.
+
+``encode_documents`` (catalog sync deltas) goes through the same worker in
+``max_batch_size`` chunks at a lower priority: queued queries always run
+first, so a large import delays a search by at most one chunk.
+
+The same batcher can be served to other processes over a Unix socket, so the
+Filtering and Symptoms apps share one copy of the model:
+
+    python -m common.embedding_service --socket /tmp/aushidi-embed.sock
+
+(EMBEDDING_BACKEND applies to the service as well), and in each app:
+
+    EMBEDDING_SERVICE_SOCKET=/tmp/aushidi-embed.sock
+
+Wire format: every message is a 4-byte big-endian length followed by a JSON
+header; an ``encode`` reply is followed by the float32 matrix bytes.
+
+    EMBEDDING_MAX_BATCH       texts per forward pass, default 64
+    EMBEDDING_BATCH_WAIT_MS   extra time to hold a batch open, default 0
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct(">I")
+# Queue priorities: lower runs first
+QUERY, DOCUMENT = 0, 1
+
+
+class MicroBatcher:
+    """Thread-safe ``encode`` that merges concurrent requests into batches."""
+
+    thread_safe = True
+
+    def __init__(self, model, max_batch_size=64, max_wait_ms=0.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def from_env(cls, model):
+        return cls(
+            model,
+            max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH", "64")),
+            max_wait_ms=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "0")),
+        )
+
+    def _submit(self, texts, priority):
+        future = Future()
+        self._queue.put((priority, next(self._order), texts, future))
+        return future
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        vectors = self._submit(texts, QUERY).result()
+        return vectors[0] if single else vectors
+
+    def encode_documents(self, texts):
+        """Encode many texts in ``max_batch_size`` chunks that queued queries overtake."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        futures = [self._submit(texts[start:start + self.max_batch_size], DOCUMENT)
+                   for start in range(0, len(texts), self.max_batch_size)]
+        return np.concatenate([future.result() for future in futures])
+
+    def _collect(self):
+        """Block for the first request, then take whatever other queries fit in the batch."""
+        batch = [self._queue.get()]
+        if batch[0][0] == DOCUMENT:
+            return batch
+        size = len(batch[0][2])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                timeout = deadline - time.monotonic()
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == DOCUMENT:
+                # Document chunks run alone, so they never stretch a query batch
+                self._queue.put(item)
+                break
+            batch.append(item)
+            size += len(item[2])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for _, _, request_texts, _ in batch for text in request_texts]
+            try:
+                vectors = np.asarray(self.model.encode(texts), dtype=np.float32).reshape(len(texts), -1)
+            except Exception as e:
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._stats_lock:
+                self.requests += len(batch)
+                self.texts += len(texts)
+                self.batches += 1
+            start = 0
+            for _, _, request_texts, future in batch:
+                future.set_result(vectors[start:start + len(request_texts)])
+                start += len(request_texts)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+                "queued": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
+
+
+def _send(sock, header, payload=b""):
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data + payload)
+
+
+def _recv_exact(sock, n):
+    chunks = bytearray()
+    while len(chunks) < n:
+        chunk = sock.recv(n - len(chunks))
+        if not chunk:
+            raise ConnectionError("embedding service closed the connection")
+        chunks.extend(chunk)
+    return bytes(chunks)
+
+
+def _recv(sock):
+    (length,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    return json.loads(_recv_exact(sock, length).decode("utf-8"))
+
+
+class EmbeddingServiceClient:
+    """SentenceTransformer-style ``encode`` backed by the Unix-socket service.
+
+    Each thread keeps its own connection, so concurrent callers reach the
+    server's batcher in parallel and get merged into the same batches.
+    """
+
+    thread_safe = True
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _request(self, header):
+        sock = self._connection()
+        try:
+            _send(sock, header)
+            reply = _recv(sock)
+            payload = _recv_exact(sock, reply.get("nbytes", 0))
+        except OSError:
+            # Drop the broken connection; the next call reconnects
+            self._local.sock = None
+            sock.close()
+            raise
+        if "error" in reply:
+            raise RuntimeError(f"embedding service error: {reply['error']}")
+        return reply, payload
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        reply, payload = self._request({"op": "encode", "texts": texts})
+        vectors = np.frombuffer(payload, dtype=np.float32).reshape(reply["shape"])
+        return vectors[0] if single else vectors
+
+    def encode_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        reply, payload = self._request({"op": "encode_documents", "texts": texts})
+        return np.frombuffer(payload, dtype=np.float32).reshape(reply["shape"])
+
+    def stats(self):
+        return self._request({"op": "stats"})[0]["stats"]
+
+    def info(self):
+        """``{"model": ..., "backend": ...}`` of the model the service runs."""
+        return self._request({"op": "info"})[0]["info"]
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        batcher = self.server.batcher
+        while True:
+            try:
+                message = _recv(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                if message.get("op") == "stats":
+                    _send(self.request, {"stats": batcher.stats()})
+                    continue
+                if message.get("op") == "info":
+                    _send(self.request, {"info": self.server.info})
+                    continue
+                encode = batcher.encode_documents if message.get("op") == "encode_documents" else batcher.encode
+                vectors = np.ascontiguousarray(encode(message["texts"]), dtype=np.float32)
+                _send(self.request, {"shape": list(vectors.shape), "nbytes": vectors.nbytes}, vectors.tobytes())
+            except Exception as e:
+                logger.error("Embedding request failed: %s", e)
+                _send(self.request, {"error": str(e)})
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, batcher, info=None):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _Handler)
+        self.batcher = batcher
+        self.info = info or {}
+
+
+def main():
+    from common.encoders import MODEL_NAME, load_model
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SERVICE_SOCKET", "/tmp/aushidi-embed.sock"))
+    parser.add_argument("--model", default=MODEL_NAME)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    model, backend = load_model(args.model)
+    batcher = MicroBatcher.from_env(model)
+    server = EmbeddingServer(args.socket, batcher, info={"model": args.model, "backend": backend})
+    logger.info("Embedding service for %s (%s) listening on %s (max batch %d, wait %.1f ms)",
+                args.model, backend, args.socket, batcher.max_batch_size, batcher.max_wait * 1000.0)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
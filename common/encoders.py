@@ -0,0 +1,67 @@
+"""Query encoders used by the Filtering and Symptoms apps.
+
+With ``EMBEDDING_SERVICE_SOCKET`` set, encoding goes to the shared embedding
+service (``python -m common.embedding_service``) and the model is not loaded
+in this process. Otherwise the model is loaded locally behind a micro-batcher.
+
+    EMBEDDING_BACKEND          torch (SentenceTransformer, default) or onnx
+    EMBEDDING_ONNX_DIR         output of ``python -m common.onnx_encoder export``
+    EMBEDDING_ONNX_QUANTIZED   1 = int8 graph (default), 0 = float32 graph
+"""
+import logging
+import os
+
+from common.embedding_cache import CachedEncoder, EmbeddingCache
+from common.embedding_service import EmbeddingServiceClient, MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "intfloat/multilingual-e5-base"
+
+
+def backend_tag():
+    """``torch``, ``onnx`` or ``onnx-int8``: the encoder variant the environment selects."""
+    backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+    if backend == "onnx":
+        return "onnx-int8" if os.getenv("EMBEDDING_ONNX_QUANTIZED", "1") != "0" else "onnx"
+    if backend != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}; expected 'torch' or 'onnx'")
+    return backend
+
+
+def cache_namespace(model_name, backend):
+    """Key prefix for stored vectors of ``model_name`` encoded by ``backend``."""
+    # Backends differ slightly, so their vectors are never mixed in a cache or a rebuild
+    return model_name if backend == "torch" else f"{model_name}:{backend}"
+
+
+def load_model(model_name=MODEL_NAME):
+    """Return ``(model, backend)`` for the configured encoder backend."""
+    backend = backend_tag()
+    if backend.startswith("onnx"):
+        from common.onnx_encoder import OnnxEncoder
+
+        model = OnnxEncoder(os.environ["EMBEDDING_ONNX_DIR"], quantized=backend == "onnx-int8")
+        return model, backend
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name), backend
+
+
+def load_encoder(model_name=MODEL_NAME):
+    """Load the configured encoder behind a shared, normalized embedding cache."""
+    socket_path = os.getenv("EMBEDDING_SERVICE_SOCKET")
+    if socket_path:
+        model = EmbeddingServiceClient(socket_path)
+        # The service may run another backend than this process's environment names
+        info = model.info()
+        model_name, backend = info["model"], info["backend"]
+        source = f"embedding service at {socket_path}"
+    else:
+        model, backend = load_model(model_name)
+        model = MicroBatcher.from_env(model)
+        source = "in-process"
+    cache = EmbeddingCache.from_env(namespace=cache_namespace(model_name, backend))
+    logger.info("Encoder %s (%s) loaded, %s (cache: %d MB in memory, persistent store: %s)",
+                model_name, backend, source, cache.max_bytes // (1024 * 1024), cache.path or "off")
+    return CachedEncoder(model, cache)
@@ -0,0 +1,217 @@
+"""Stage timers, a Prometheus ``/metrics`` endpoint and Server-Timing headers.
+
+Pipelines wrap their stages in ``stage``:
+
+    with stage("fuzzy"):
+        scores = fuzzy_scores(...)
+
+Every timed stage feeds the ``aushidi_stage_seconds`` histogram and, inside
+a request, that response's ``Server-Timing`` header (repeated stages are
+summed). ``install(app)`` adds the request hooks, a per-endpoint
+``aushidi_request_seconds`` histogram and ``GET /metrics`` in the Prometheus
+text format; ``timed_endpoint`` does the same for async (ASGI) handlers.
+``register_gauge`` exposes values read at scrape time, such as cache hit
+ratios and index sizes.
+
+    METRICS_ENABLED   0 turns timers, hooks and /metrics off (default 1)
+    SERVER_TIMING     0 omits the Server-Timing header (default 1)
+
+Metrics live in the process; with several worker processes, scrape each one.
+"""
+import bisect
+import contextlib
+import contextvars
+import functools
+import math
+import os
+import threading
+import time
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+SERVER_TIMING = ENABLED and os.getenv("SERVER_TIMING", "1") != "0"
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (stage, seconds) pairs of the request being handled, None outside requests
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+_NOOP = contextlib.nullcontext()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one label, as Prometheus expects."""
+
+    def __init__(self, name, help_text, label, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        with self._lock:
+            snapshot = [(value, list(counts), total, count) for value, (counts, total, count) in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for value, counts, total, count in sorted(snapshot):
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total!r}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+
+STAGES = Histogram("aushidi_stage_seconds", "Time spent in each pipeline stage.", "stage")
+REQUESTS = Histogram("aushidi_request_seconds", "Request latency by Flask endpoint.", "endpoint")
+_gauges = []
+
+
+def register_gauge(name, help_text, read, label=None):
+    """Expose ``read()`` at scrape time: a number, or ``{label_value: number}`` when ``label`` is set."""
+    _gauges.append((name, help_text, read, label))
+
+
+def register_encoder_gauges(encoder):
+    """Embedding cache and micro-batcher gauges for a ``CachedEncoder``."""
+    register_gauge("aushidi_embedding_cache_hit_ratio", "Query embedding cache hit ratio.",
+                   lambda: encoder.cache.stats()["hit_ratio"])
+    register_gauge("aushidi_embedding_cache_entries", "Query embeddings held in memory.",
+                   lambda: encoder.cache.stats()["entries"])
+    register_gauge("aushidi_embedding_cache_bytes", "Memory used by the query embedding cache.",
+                   lambda: encoder.cache.stats()["bytes"])
+    if hasattr(encoder.model, "stats"):
+        register_gauge("aushidi_embedding_mean_batch_size", "Mean texts per encoder forward pass.",
+                       lambda: encoder.model.stats()["mean_batch_size"])
+
+
+def _render_gauges():
+    lines = []
+    for name, help_text, read, label in _gauges:
+        try:
+            value = read()
+        except Exception as e:  # a failing gauge must not break the scrape
+            lines.append(f"# {name} unavailable: {_escape(e)}")
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        if label is None:
+            lines.append(f"{name} {_number(value)}")
+        else:
+            lines += [f'{name}{{{label}="{_escape(key)}"}} {_number(item)}' for key, item in sorted(value.items())]
+    return lines
+
+
+def render():
+    lines = STAGES.render() + REQUESTS.render() + _render_gauges()
+    return "\n".join(lines) + "\n"
+
+
+@contextlib.contextmanager
+def _timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGES.observe(name, elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def stage(name):
+    """Context manager timing one pipeline stage (a no-op when metrics are off)."""
+    return _timed(name) if ENABLED else _NOOP
+
+
+def server_timing(timings, total):
+    durations = {}
+    for name, seconds in timings:
+        durations[name] = durations.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in durations.items()]
+    return ", ".join(parts + [f"total;dur={total * 1000:.2f}"])
+
+
+def install(app):
+    """Add request timing hooks and ``GET /metrics`` to a Flask app."""
+    if not ENABLED:
+        return
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_token = _request_timings.set([])
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        REQUESTS.observe(request.endpoint or "unmatched", total)
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = server_timing(_request_timings.get() or [], total)
+        return response
+
+    @app.teardown_request
+    def _reset_request_timer(exc):
+        token = g.pop("metrics_token", None)
+        if token is not None:
+            try:
+                _request_timings.reset(token)
+            except ValueError:  # torn down in another context; just drop the timings
+                _request_timings.set(None)
+
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics)
+
+
+def timed_endpoint(name):
+    """Decorator giving an async request handler the timing ``install`` adds to Flask views."""
+    def decorate(handler):
+        if not ENABLED:
+            return handler
+
+        @functools.wraps(handler)
+        async def wrapper(request):
+            start = time.perf_counter()
+            token = _request_timings.set([])
+            try:
+                response = await handler(request)
+                timings = _request_timings.get()
+            finally:
+                total = time.perf_counter() - start
+                _request_timings.reset(token)
+                REQUESTS.observe(name, total)
+            if SERVER_TIMING:
+                response.headers["Server-Timing"] = server_timing(timings, total)
+            return response
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,189 @@
+"""ONNX Runtime backend for the multilingual-e5 query encoder.
+
+``OnnxEncoder`` has the same ``encode`` interface as SentenceTransformer
+(mean pooling over the last hidden state, then L2 normalisation, as in the
+e5 sentence-transformers config) but runs an exported ONNX graph, optionally
+with int8 dynamically quantized weights. Run from the repository root:
+
+    # export model.onnx and model.int8.onnx (needs torch + onnxruntime)
+    python -m common.onnx_encoder export --output models/e5-onnx
+
+    # parity and latency against the PyTorch model on a real catalog
+    python -m common.onnx_encoder check --onnx-dir models/e5-onnx \\
+        --parquet "Medicine Filtering using Embedding + Vector DB/embedding files/medicine_with_both_filters.parquet" \\
+        --embedding-column embedding_filter_3 --text-column filter_3
+
+The check reports cosine agreement between the two backends' query vectors,
+overlap@k of their top-k results over the catalog's stored embeddings, and
+single-query p50/p99 and batch throughput for each backend.
+
+Select it in the apps with EMBEDDING_BACKEND=onnx and EMBEDDING_ONNX_DIR;
+EMBEDDING_ONNX_QUANTIZED=0 loads the float32 graph instead of the int8 one.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_FILE = "model.int8.onnx"
+
+
+class OnnxEncoder:
+    def __init__(self, model_dir, quantized=True, batch_size=32, max_length=512, threads=0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.path = os.path.join(model_dir, QUANTIZED_FILE if quantized else MODEL_FILE)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(self.path, options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.input_names = [item.name for item in self.session.get_inputs()]
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    def _encode_batch(self, texts):
+        tokens = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts, batch_size=None, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batch_size = batch_size or self.batch_size
+        vectors = np.concatenate([self._encode_batch(texts[start:start + batch_size])
+                                  for start in range(0, len(texts), batch_size)]).astype(np.float32)
+        return vectors[0] if single else vectors
+
+
+def export_onnx(model_name, output_dir, quantize=True, opset=17):
+    """Export ``model_name``'s transformer to ONNX (and an int8 copy) with its tokenizer."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["paracetamol tablet for fever"], return_tensors="pt")
+    names = list(sample.keys())
+    axes = {name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]}
+    path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(sample[name] for name in names), path, input_names=names,
+                          output_names=["last_hidden_state"], dynamic_axes=axes, opset_version=opset)
+    print(f"exported {path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(output_dir, QUANTIZED_FILE)
+        quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"quantized {quantized_path}")
+    with open(os.path.join(output_dir, "encoder.json"), "w") as f:
+        json.dump({"model_name": model_name, "opset": opset, "quantized": quantize}, f, indent=2)
+
+
+def _latency(encoder, queries, batch_size):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        encoder.encode([query])
+        timings.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    encoder.encode(queries, batch_size=batch_size)
+    throughput = len(queries) / (time.perf_counter() - start)
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99)), throughput
+
+
+def parity_check(reference, candidate, queries, catalog_matrix, k=10, batch_size=32):
+    """Compare ``candidate`` with ``reference`` on ``queries``; both expose ``encode``."""
+    ref = np.asarray(reference.encode(queries), dtype=np.float32)
+    cand = np.asarray(candidate.encode(queries), dtype=np.float32)
+    cosine = np.sum(ref * cand, axis=1) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(cand, axis=1))
+
+    def top_k(vectors):
+        # Same ranking as the FAISS L2 indexes on the catalog vectors
+        distances = (catalog_matrix ** 2).sum(axis=1)[None, :] - 2.0 * vectors @ catalog_matrix.T
+        return np.argsort(distances, axis=1)[:, :k]
+
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(top_k(ref), top_k(cand))]
+    report = {
+        "queries": len(queries),
+        "cosine_mean": round(float(cosine.mean()), 5),
+        "cosine_min": round(float(cosine.min()), 5),
+        f"overlap@{k}": round(float(np.mean(overlap)), 4),
+    }
+    for name, encoder in (("reference", reference), ("candidate", candidate)):
+        p50, p99, throughput = _latency(encoder, queries, batch_size)
+        report[f"{name}_p50_ms"] = round(p50, 2)
+        report[f"{name}_p99_ms"] = round(p99, 2)
+        report[f"{name}_texts_per_s"] = round(throughput, 1)
+    return report
+
+
+def main():
+    from common.encoders import MODEL_NAME
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="export the encoder to ONNX")
+    export.add_argument("--model", default=MODEL_NAME)
+    export.add_argument("--output", required=True)
+    export.add_argument("--no-quantize", action="store_true")
+    export.add_argument("--opset", type=int, default=17)
+
+    check = commands.add_parser("check", help="parity and latency against the PyTorch encoder")
+    check.add_argument("--onnx-dir", required=True)
+    check.add_argument("--float32", action="store_true", help="check model.onnx instead of the int8 graph")
+    check.add_argument("--model", default=MODEL_NAME)
+    check.add_argument("--parquet", required=True)
+    check.add_argument("--embedding-column", required=True, help="stored catalog embeddings to rank against")
+    check.add_argument("--text-column", required=True, help="catalog text to sample queries from")
+    check.add_argument("--queries-file", help="one query per line (instead of sampling the catalog)")
+    check.add_argument("--queries", type=int, default=200)
+    check.add_argument("--k", type=int, default=10)
+    check.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = default)")
+    check.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.model, args.output, quantize=not args.no_quantize, opset=args.opset)
+        return
+
+    import pandas as pd
+    from sentence_transformers import SentenceTransformer
+
+    from common.artifacts import read_embedding_matrix
+
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        texts = pd.read_parquet(args.parquet, columns=[args.text_column])[args.text_column].astype(str)
+        queries = texts.sample(min(args.queries, len(texts)), random_state=0).tolist()
+    catalog_matrix = read_embedding_matrix(args.parquet, args.embedding_column)
+    reference = SentenceTransformer(args.model)
+    candidate = OnnxEncoder(args.onnx_dir, quantized=not args.float32, threads=args.threads)
+    report = parity_check(reference, candidate, queries, catalog_matrix, k=args.k)
+    report["candidate"] = candidate.path
+    print(" ".join(f"{key}={value}" for key, value in report.items()), flush=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
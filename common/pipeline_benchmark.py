@@ -0,0 +1,227 @@
+"""Offline benchmark of the Filtering search and Symptoms retrieval pipelines.
+
+Runs on synthetic catalogs shaped like medicine_data_filter_2_3.xlsx with the
+deterministic stub encoder, so no parquet, model download or API key is
+needed. Run from the repository root:
+
+    python -m common.pipeline_benchmark --sizes 1000 10000 100000 --output bench/HEAD.json
+    python -m common.pipeline_benchmark --sizes 1000 10000 100000 --compare bench/HEAD.json
+
+For every catalog size it reports:
+
+* catalog build time and peak traced memory (numpy/pandas/Python objects),
+  plus the process peak RSS at the end (covers FAISS allocations);
+* p50/p99 latency per stage of ``search_medicine_pipeline`` (encode,
+  vector_search, fuzzy) and end to end, and of the Symptoms retrieval
+  (encode, retrieve);
+* end-to-end throughput (queries/s) over ``--threads`` workers.
+
+Results are saved as JSON together with the git commit. ``--compare`` prints
+the change of every latency/throughput metric against an earlier run and
+exits with status 1 when one regresses by more than ``--threshold``.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Symptoms to Medicine using langchain + 1 LLM"))
+sys.path.insert(0, os.path.join(ROOT, "Medicine Filtering using Embedding + Vector DB"))
+
+import search_engine  # noqa: E402
+from retrieval import retrieve  # noqa: E402
+from synthetic_catalog import StubEncoder, build_synthetic_catalog, make_catalog_frame, sample_queries  # noqa: E402
+
+from common.text_fields import add_text_fields  # noqa: E402
+from common.vector_index import BACKENDS, IndexConfig, build_index  # noqa: E402
+
+# Metrics where a larger value is better; every other *_ms metric is a latency
+HIGHER_IS_BETTER = ("throughput_qps",)
+
+
+def percentiles(timings):
+    return round(float(np.percentile(timings, 50)), 3), round(float(np.percentile(timings, 99)), 3)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    return value, (time.perf_counter() - start) * 1000
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def bench_filtering(n_rows, dim, n_queries, threads, duration_s, config):
+    tracemalloc.start()
+    start = time.perf_counter()
+    catalog, encoder, _, _ = build_synthetic_catalog(n_rows, dim=dim, index_config=config)
+    build_s = time.perf_counter() - start
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    queries = sample_queries(catalog.df, n_queries)
+    stages = {"encode": [], "vector_search": [], "fuzzy": [], "end_to_end": []}
+    for query, form_filter in queries:
+        vector, ms = timed(encoder.encode, query)
+        stages["encode"].append(ms)
+        _, ms = timed(search_engine.vector_search, catalog, vector, form_filter)
+        stages["vector_search"].append(ms)
+        _, ms = timed(search_engine.fuzzy_scores, catalog, query, 50, form_filter)
+        stages["fuzzy"].append(ms)
+        _, ms = timed(search_engine.search_medicine_pipeline, catalog, encoder.encode, query, form_filter=form_filter)
+        stages["end_to_end"].append(ms)
+
+    def run(i):
+        query, form_filter = queries[i % len(queries)]
+        search_engine.search_medicine_pipeline(catalog, encoder.encode, query, form_filter=form_filter)
+
+    result = {"pipeline": "filtering", "rows": n_rows, "build_s": round(build_s, 2),
+              "build_peak_traced_mb": round(build_peak / (1024 * 1024), 1)}
+    for stage, timings in stages.items():
+        result[f"{stage}_p50_ms"], result[f"{stage}_p99_ms"] = percentiles(timings)
+    result["throughput_qps"] = throughput(run, threads, duration_s)
+    return result
+
+
+def bench_symptoms(n_rows, dim, n_queries, threads, duration_s, config):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = add_text_fields(make_catalog_frame(n_rows), ["combined_text"])
+    encoder = StubEncoder(dim)
+    index = build_index(encoder.encode(df["combined_text"].tolist()), config)
+    build_s = time.perf_counter() - start
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rng = np.random.default_rng(0)
+    queries = [f"{symptom} aur {disease.lower()}" for symptom, disease in zip(
+        df["Symptoms"].iloc[rng.integers(0, n_rows, n_queries)].str.split(", ").str[0],
+        df["Cover Disease"].iloc[rng.integers(0, n_rows, n_queries)].str.split(", ").str[0])]
+    stages = {"encode": [], "retrieve": [], "end_to_end": []}
+    for query in queries:
+        vector, encode_ms = timed(encoder.encode, query)
+        _, retrieve_ms = timed(retrieve, df, index, vector)
+        stages["encode"].append(encode_ms)
+        stages["retrieve"].append(retrieve_ms)
+        stages["end_to_end"].append(encode_ms + retrieve_ms)
+
+    def run(i):
+        retrieve(df, index, encoder.encode(queries[i % len(queries)]))
+
+    result = {"pipeline": "symptoms", "rows": n_rows, "build_s": round(build_s, 2),
+              "build_peak_traced_mb": round(build_peak / (1024 * 1024), 1)}
+    for stage, timings in stages.items():
+        result[f"{stage}_p50_ms"], result[f"{stage}_p99_ms"] = percentiles(timings)
+    result["throughput_qps"] = throughput(run, threads, duration_s)
+    return result
+
+
+def throughput(run, threads, duration_s):
+    """Queries per second over ``threads`` workers for about ``duration_s`` seconds."""
+    counter = iter(range(sys.maxsize))
+    deadline = time.perf_counter() + duration_s
+
+    def worker():
+        done = 0
+        while time.perf_counter() < deadline:
+            run(next(counter))
+            done += 1
+        return done
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        total = sum(pool.map(lambda _: worker(), range(threads)))
+    return round(total / (time.perf_counter() - start), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Print metric changes against ``baseline``; return the regressions."""
+    previous = {(row["pipeline"], row["rows"]): row for row in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        base = previous.get((row["pipeline"], row["rows"]))
+        if base is None:
+            continue
+        for metric, value in row.items():
+            if not (metric.endswith("_ms") or metric in HIGHER_IS_BETTER) or not base.get(metric):
+                continue
+            change = (value - base[metric]) / base[metric]
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = "REGRESSION" if worse > threshold else ""
+            print(f"{row['pipeline']:>9} rows={row['rows']:<8} {metric:<22} {base[metric]:>10} -> {value:>10} "
+                  f"({change:+.1%}) {flag}")
+            if flag:
+                regressions.append((row["pipeline"], row["rows"], metric, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--pipelines", nargs="+", choices=["filtering", "symptoms"], default=["filtering", "symptoms"])
+    parser.add_argument("--backend", choices=BACKENDS, default="flat")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per throughput run")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--compare", help="earlier --output file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    benches = {"filtering": bench_filtering, "symptoms": bench_symptoms}
+    results = []
+    for n_rows in args.sizes:
+        for pipeline in args.pipelines:
+            row = benches[pipeline](n_rows, args.dim, args.queries, args.threads, args.duration,
+                                    IndexConfig(backend=args.backend))
+            results.append(row)
+            print(" ".join(f"{key}={value}" for key, value in row.items()), flush=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+    print(f"peak RSS: {report['peak_rss_mb']} MB")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"compared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
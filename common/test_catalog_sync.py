@@ -0,0 +1,129 @@
+"""Tests for common/catalog_sync.py: run with ``python -m pytest`` from the repository root."""
+import zlib
+from datetime import datetime, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("faiss")
+pytest.importorskip("pyarrow")
+
+from common.artifacts import build_artifacts, load_catalog  # noqa: E402
+from common.catalog_sync import ChangeFeed, apply_updates, diff_records  # noqa: E402
+from common.vector_index import IndexConfig, build_index  # noqa: E402
+
+DIM = 8
+
+
+def encode(texts):
+    """Deterministic vectors: the same text always maps to the same point."""
+    return np.stack([np.random.default_rng(zlib.crc32(text.encode("utf-8"))).random(DIM, dtype=np.float32)
+                     for text in texts])
+
+
+def catalog_frame(n_rows):
+    texts = [f"medicine {i} for fever and cold" for i in range(n_rows)]
+    return pd.DataFrame({
+        "Batch_ID": [f"BATCH_{i}" for i in range(n_rows)],
+        "Name of Medicine": [f"Medicine {i}" for i in range(n_rows)],
+        "text": texts,
+        "Price_INR": np.arange(n_rows, dtype=np.int64) + 10,
+    })
+
+
+@pytest.mark.parametrize("backend", ["flat", "ivf_flat", "sq8"])
+def test_update_memory_mapped_index(tmp_path, backend):
+    parquet_path = str(tmp_path / "catalog.parquet")
+    frame = catalog_frame(200)
+    frame.assign(embedding=list(encode(frame["text"].tolist()))).to_parquet(parquet_path)
+    config = IndexConfig(backend=backend, nlist=4)
+    build_artifacts(parquet_path, ["embedding"], config)
+    df, artifacts = load_catalog(parquet_path, ["embedding"], config)
+    index = artifacts["embedding"][1]
+
+    incoming = df.iloc[[0, 1]].copy()
+    incoming.loc[0, "text"] = "changed text"
+    incoming.loc[1, "Price_INR"] = 999
+    incoming = pd.concat([incoming, catalog_frame(201).iloc[[200]]], ignore_index=True)
+    update = apply_updates(df, {"text": index}, len(df), incoming, encode)
+
+    assert update.summary() == {"new": 1, "reembedded": 1, "updated": 1, "deleted": 0, "rows": 201}
+    new_index = update.indexes["text"]
+    assert new_index.ntotal == 201
+    assert index.ntotal == 200  # the mapped original keeps serving the old snapshot
+    _, ids = new_index.search(encode(["changed text"]), 1)
+    assert ids[0, 0] == 200
+    assert update.df.loc[1, "Price_INR"] == 999
+
+
+def test_diff_ignores_dtype_drift():
+    current = catalog_frame(3).assign(Total_Quantity=[5.0, np.nan, 7.0], Expiry=[None, "2026-01", None])
+    incoming = current.astype(object).assign(
+        Price_INR=[10.0, 11.0, 12.5],  # 12 -> 12.5 is a real change
+        Total_Quantity=[5, None, np.int64(7)],
+        Expiry=[np.nan, "2026-01", None],
+    )
+    new_rows, text_changed, other_changed = diff_records(current, incoming, ["text"])
+    assert new_rows.empty and text_changed.empty
+    assert other_changed["Batch_ID"].tolist() == ["BATCH_2"]
+
+
+def test_change_feed_add_update_delete():
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient()["medicine_db"]["oct_medicines"]
+    start = datetime(2026, 1, 1)
+    collection.insert_many([{**record, "updated_at": start} for record in catalog_frame(5).to_dict("records")])
+    feed = ChangeFeed(collection)
+
+    def sync(df, index, next_row_id):
+        records, deleted = feed.poll()
+        update = apply_updates(df, {"text": index}, next_row_id, records, encode, deleted)
+        feed.commit()
+        return update, len(records)
+
+    empty = catalog_frame(0)
+    update, n_read = sync(empty, build_index(np.zeros((0, DIM), np.float32)), 0)
+    assert n_read == 5 and update.summary()["new"] == 5
+
+    later = start + timedelta(minutes=5)
+    collection.insert_one({**catalog_frame(6).iloc[5].to_dict(), "updated_at": later})
+    collection.update_one({"Batch_ID": "BATCH_1"}, {"$set": {"text": "new text", "updated_at": later}})
+    collection.update_one({"Batch_ID": "BATCH_2"}, {"$set": {"Price_INR": 500, "updated_at": later}})
+    collection.delete_one({"Batch_ID": "BATCH_3"})
+    update, n_read = sync(update.df, update.indexes["text"], update.next_row_id)
+
+    assert update.summary() == {"new": 1, "reembedded": 1, "updated": 1, "deleted": 1, "rows": 5}
+    df = update.df
+    assert sorted(df["Batch_ID"]) == ["BATCH_0", "BATCH_1", "BATCH_2", "BATCH_4", "BATCH_5"]
+    assert df.loc[df["Batch_ID"] == "BATCH_2", "Price_INR"].item() == 500
+    assert update.indexes["text"].ntotal == 5
+    _, ids = update.indexes["text"].search(encode(["new text"]), 1)
+    assert df.loc[ids[0, 0], "Batch_ID"] == "BATCH_1"
+
+    update, n_read = sync(update.df, update.indexes["text"], update.next_row_id)
+    assert n_read == 3  # only the documents of the newest updated_at are read again
+    assert not update.changed
+
+
+def test_change_feed_clears_nulled_field():
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient()["medicine_db"]["oct_medicines"]
+    start = datetime(2026, 1, 1)
+    frame = catalog_frame(3).assign(**{"Side Effects": ["nausea", "rash", "drowsiness"]})
+    collection.insert_many([{**record, "updated_at": start} for record in frame.to_dict("records")])
+    feed = ChangeFeed(collection)
+    records, deleted = feed.poll()
+    update = apply_updates(catalog_frame(0).assign(**{"Side Effects": []}), {"text": build_index(np.zeros((0, DIM), np.float32))},
+                           0, records, encode, deleted)
+    feed.commit()
+
+    later = start + timedelta(minutes=5)
+    collection.update_one({"Batch_ID": "BATCH_1"}, {"$set": {"Side Effects": None, "Price_INR": None, "updated_at": later}})
+    records, deleted = feed.poll()
+    update = apply_updates(update.df, update.indexes, update.next_row_id, records, encode, deleted)
+
+    assert update.summary()["updated"] == 1
+    row = update.df.loc[update.df["Batch_ID"] == "BATCH_1"].iloc[0]
+    assert pd.isna(row["Side Effects"]) and pd.isna(row["Price_INR"])
+    assert update.df.loc[update.df["Batch_ID"] == "BATCH_2", "Side Effects"].item() == "drowsiness"
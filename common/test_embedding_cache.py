@@ -0,0 +1,39 @@
+"""Tests for common/embedding_cache.py: run with ``python -m pytest`` from the repository root."""
+import zlib
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from common.embedding_cache import CachedEncoder, EmbeddingCache  # noqa: E402
+
+
+class CaseSensitiveModel:
+    """Records what it is asked to encode; different spellings give different vectors."""
+
+    def __init__(self):
+        self.seen = []
+
+    def encode(self, texts, **kwargs):
+        self.seen.extend(texts)
+        return np.stack([np.random.default_rng(zlib.crc32(text.encode("utf-8"))).random(4, dtype=np.float32)
+                         for text in texts])
+
+
+def test_model_sees_the_query_as_typed():
+    model = CaseSensitiveModel()
+    encoder = CachedEncoder(model, EmbeddingCache())
+    vector = encoder.encode("Paracetamol  IP ")
+    assert model.seen == ["Paracetamol IP"]
+    np.testing.assert_array_equal(vector, model.encode(["Paracetamol IP"])[0])  # same as the uncached model
+
+    model.seen.clear()
+    np.testing.assert_array_equal(encoder.encode("paracetamol ip"), vector)  # same key, served from the cache
+    assert model.seen == []
+
+
+def test_first_spelling_per_key_is_encoded_once():
+    model = CaseSensitiveModel()
+    vectors = CachedEncoder(model, EmbeddingCache()).encode_many(["Dolo 650", "DOLO 650", "Crocin"])
+    assert model.seen == ["Dolo 650", "Crocin"]
+    np.testing.assert_array_equal(vectors[0], vectors[1])
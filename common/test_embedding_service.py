@@ -0,0 +1,63 @@
+"""Tests for common/embedding_service.py: run with ``python -m pytest`` from the repository root."""
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from common.embedding_service import MicroBatcher  # noqa: E402
+
+
+class RecordingModel:
+    """Slow model that records the texts of every forward pass."""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, **kwargs):
+        time.sleep(0.01)
+        self.batches.append(list(texts))
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+
+def test_concurrent_queries_share_one_forward_pass():
+    model = RecordingModel()
+    n = 8
+    batcher = MicroBatcher(model, max_batch_size=n, max_wait_ms=1000)
+    texts = ["x" * (i + 1) for i in range(n)]
+    start = threading.Barrier(n)
+    results = {}
+
+    def query(text):
+        start.wait()
+        results[text] = batcher.encode(text)
+
+    threads = [threading.Thread(target=query, args=(text,)) for text in texts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(model.batches) == 1
+    assert sorted(model.batches[0]) == sorted(texts)
+    assert {text: vector.tolist() for text, vector in results.items()} == {text: [float(len(text))] for text in texts}
+
+
+def test_documents_are_chunked_behind_queries():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=4)
+    documents = [f"document {i}" for i in range(40)]
+    result = {}
+    sync = threading.Thread(target=lambda: result.update(vectors=batcher.encode_documents(documents)))
+    sync.start()
+    time.sleep(0.025)
+    query_vector = batcher.encode("fever")
+    sync.join()
+
+    assert query_vector.tolist() == [5.0]
+    np.testing.assert_array_equal(result["vectors"][:, 0], [len(text) for text in documents])
+    assert all(len(batch) <= 4 for batch in model.batches)
+    query_batch = next(i for i, batch in enumerate(model.batches) if "fever" in batch)
+    assert model.batches[query_batch] == ["fever"]  # never merged into a document chunk
+    assert query_batch < len(model.batches) - 1  # ran before the sync finished
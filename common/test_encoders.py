@@ -0,0 +1,39 @@
+"""Tests for common/encoders.py: run with ``python -m pytest`` from the repository root."""
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from common.embedding_service import EmbeddingServer, MicroBatcher  # noqa: E402
+from common.encoders import MODEL_NAME, backend_tag, load_encoder  # noqa: E402
+
+
+class ConstantModel:
+    def encode(self, texts, **kwargs):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+@pytest.mark.parametrize("backend, quantized, tag", [
+    ("torch", "1", "torch"), ("onnx", "1", "onnx-int8"), ("onnx", "0", "onnx"),
+])
+def test_backend_tag(monkeypatch, backend, quantized, tag):
+    monkeypatch.setenv("EMBEDDING_BACKEND", backend)
+    monkeypatch.setenv("EMBEDDING_ONNX_QUANTIZED", quantized)
+    assert backend_tag() == tag
+
+
+def test_socket_encoder_uses_the_service_backend(tmp_path, monkeypatch):
+    path = str(tmp_path / "embed.sock")
+    server = EmbeddingServer(path, MicroBatcher(ConstantModel()), info={"model": MODEL_NAME, "backend": "onnx-int8"})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        monkeypatch.setenv("EMBEDDING_SERVICE_SOCKET", path)
+        monkeypatch.setenv("EMBEDDING_BACKEND", "torch")  # what this process would pick on its own
+        monkeypatch.setenv("EMBEDDING_CACHE_PATH", "")
+        encoder = load_encoder()
+        assert encoder.cache.namespace == f"{MODEL_NAME}:onnx-int8"
+        assert encoder.encode("fever").shape == (4,)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,37 @@
+"""Text fields that get embedded, built exactly like the notebooks built them."""
+
+
+def build_filter_2(df):
+    return ("Category: " + df["Category"].astype(str) + " | " +
+            "Symptoms: " + df["Symptoms"].astype(str) + " | " +
+            "Cover Disease: " + df["Cover Disease"].astype(str))
+
+
+def build_filter_3(df):
+    return df["Description in Hinglish"]
+
+
+def build_combined_text(df):
+    return ("Medicine: " + df["Name of Medicine"].astype(str) +
+            " | Category: " + df["Category"].astype(str) +
+            " | Form: " + df["Medicine Forms"].astype(str) +
+            " | Cures: " + df["Cover Disease"].astype(str) +
+            " | Symptoms: " + df["Symptoms"].astype(str) +
+            " | Side Effects: " + df["Side Effects"].astype(str) +
+            " | Instructions: " + df["Instructions"].astype(str) +
+            " | Note: " + df["Description in Hinglish"].astype(str))
+
+
+TEXT_FIELD_BUILDERS = {
+    "filter_2": build_filter_2,
+    "filter_3": build_filter_3,
+    "combined_text": build_combined_text,
+}
+
+
+def add_text_fields(df, fields):
+    """Return a copy of ``df`` with the named text fields (re)built."""
+    df = df.copy()
+    for field in fields:
+        df[field] = TEXT_FIELD_BUILDERS[field](df)
+    return df
@@ -0,0 +1,172 @@
+"""Configurable FAISS index backends for the medicine embeddings.
+
+The backend is chosen with environment variables (``.env`` works too):
+
+    FAISS_INDEX_BACKEND   flat (default, exact) | ivf_flat | hnsw | ivf_pq
+                          | sq_fp16 | sq8 | pq (compressed exhaustive scans)
+    FAISS_NLIST           IVF cells; default 4 * sqrt(rows)
+    FAISS_NPROBE          IVF cells visited per query (search time), default 16
+    FAISS_HNSW_M          HNSW graph degree, default 32
+    FAISS_EF_CONSTRUCTION HNSW build beam width, default 200
+    FAISS_EF_SEARCH       HNSW search beam width (search time), default 64
+    FAISS_PQ_M            PQ sub-quantizers (must divide the dimension), default 48
+    FAISS_PQ_NBITS        bits per PQ code, default 8 (ivf_pq and pq)
+
+Every index is built with explicit int64 ids equal to the row position, so
+rows can later be added or replaced by id. Distances stay squared L2 for all
+backends; with the quantized backends they are approximations, so
+``vector_threshold`` filters become slightly fuzzier.
+
+The compressed backends scan every row like ``flat`` but store codes instead
+of float32 vectors: ``sq_fp16`` halves the memory with practically the same
+ranking, ``sq8`` quarters it, and ``pq`` keeps ``FAISS_PQ_M`` bytes per row
+(16x smaller at 768 dims with the defaults). ``python -m common.ann_benchmark``
+reports their size and recall against ``flat``.
+"""
+import logging
+import math
+import os
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("flat", "ivf_flat", "hnsw", "ivf_pq", "sq_fp16", "sq8", "pq")
+# Backends whose index holds no float32 copy of the vectors
+COMPRESSED_BACKENDS = ("ivf_pq", "sq_fp16", "sq8", "pq")
+
+
+class IndexConfig:
+    def __init__(self, backend="flat", nlist=None, nprobe=16, hnsw_m=32, ef_construction=200,
+                 ef_search=64, pq_m=48, pq_nbits=8):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown FAISS backend {backend!r}, expected one of {BACKENDS}")
+        self.backend = backend
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+
+    @classmethod
+    def from_env(cls):
+        nlist = os.getenv("FAISS_NLIST")
+        return cls(
+            backend=os.getenv("FAISS_INDEX_BACKEND", "flat").lower(),
+            nlist=int(nlist) if nlist else None,
+            nprobe=int(os.getenv("FAISS_NPROBE", "16")),
+            hnsw_m=int(os.getenv("FAISS_HNSW_M", "32")),
+            ef_construction=int(os.getenv("FAISS_EF_CONSTRUCTION", "200")),
+            ef_search=int(os.getenv("FAISS_EF_SEARCH", "64")),
+            pq_m=int(os.getenv("FAISS_PQ_M", "48")),
+            pq_nbits=int(os.getenv("FAISS_PQ_NBITS", "8")),
+        )
+
+    def build_params(self):
+        """Parameters baked into a built index (search-time knobs excluded)."""
+        params = {"backend": self.backend}
+        if self.backend in ("ivf_flat", "ivf_pq"):
+            params["nlist"] = self.nlist
+        if self.backend == "hnsw":
+            params.update(hnsw_m=self.hnsw_m, ef_construction=self.ef_construction)
+        if self.backend in ("ivf_pq", "pq"):
+            params.update(pq_m=self.pq_m, pq_nbits=self.pq_nbits)
+        return params
+
+    def __repr__(self):
+        return f"IndexConfig({self.build_params()}, nprobe={self.nprobe}, ef_search={self.ef_search})"
+
+
+def _nlist_for(config, n_rows):
+    nlist = config.nlist or int(4 * math.sqrt(n_rows))
+    # FAISS wants ~39 training points per centroid
+    return max(1, min(nlist, n_rows // 39))
+
+
+def build_index(matrix, config=None, ids=None):
+    """Build and populate an index for ``matrix`` (rows get ``ids`` or 0..n-1)."""
+    config = config or IndexConfig()
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    n_rows, dim = matrix.shape
+    ids = np.arange(n_rows, dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+    backend = config.backend
+
+    if backend in ("ivf_pq", "pq") and (dim % config.pq_m or n_rows < 2 ** config.pq_nbits):
+        fallback = "ivf_flat" if backend == "ivf_pq" else "sq8"
+        logger.warning("%s needs dim %% pq_m == 0 and at least %d rows; falling back to %s",
+                       backend, 2 ** config.pq_nbits, fallback)
+        backend = fallback
+
+    if backend == "flat":
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    elif backend in ("sq_fp16", "sq8", "pq"):
+        if backend == "pq":
+            base = faiss.IndexPQ(dim, config.pq_m, config.pq_nbits)
+        else:
+            qtype = faiss.ScalarQuantizer.QT_fp16 if backend == "sq_fp16" else faiss.ScalarQuantizer.QT_8bit
+            base = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_L2)
+        # sq8 learns per-dimension ranges and pq its codebooks; later rows reuse them
+        base.train(matrix)
+        index = faiss.IndexIDMap2(base)
+    elif backend == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, config.hnsw_m)
+        base.hnsw.efConstruction = config.ef_construction
+        index = faiss.IndexIDMap2(base)
+    else:
+        nlist = _nlist_for(config, n_rows)
+        quantizer = faiss.IndexFlatL2(dim)
+        if backend == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, config.pq_m, config.pq_nbits)
+        index.train(matrix)
+
+    index.add_with_ids(matrix, ids)
+    apply_search_params(index, config)
+    return index
+
+
+def index_bytes(index):
+    """Serialized size of ``index``: its codes plus ids and trained parameters."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def base_index(index):
+    """Return the index under an id map, downcast to its concrete type."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def apply_search_params(index, config):
+    """Apply the search-time knobs (nprobe / efSearch) to a built or loaded index."""
+    base = base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = config.nprobe
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = config.ef_search
+    return index
+
+
+def id_selector(ids):
+    """FAISS selector admitting only ``ids`` (hashed, O(1) per candidate)."""
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    return faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+
+
+def filtered_search_params(index, selector):
+    """SearchParameters restricting ``index.search`` to ``selector``.
+
+    The index's current nprobe / efSearch are carried over, since passing
+    parameters replaces the values set by ``apply_search_params``.
+    """
+    base = base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)